@@ -0,0 +1,64 @@
+"""
+Benchmark of the binary track format: hole detection plus bounds of a synthetic track
+read from GPX (streaming parser) against the memory-mapped binary sidecar. The
+binary file is converted back to GPX to check the round trip.
+
+    python benchmarks/bench_binary.py
+"""
+
+import filecmp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from gpxfix.binary import convert, read_track
+from gpxfix.core import detect_holes
+from gpxfix.parser import read_gpx
+from gpxfix.track import Track
+from gpxfix.writer import write_gpx
+
+
+def synthetic(n, path):
+    i = np.arange(n)
+    track = Track(
+        47 + i * 1e-5,
+        8 + i * 1e-5,
+        400.0 + i % 100,
+        1_714_550_400_000_000 + i * 1_000_000 + (i // 1000) * 60_000_000,
+        name="Benchmark",
+    )
+    write_gpx(track, path)
+
+
+def analyse(read, path):
+    start = time.perf_counter()
+    track = read(path)
+    holes = detect_holes(track)
+    track.bounds()
+    return time.perf_counter() - start, holes
+
+
+def main():
+    print(f"{'points':>8} {'GPX [ms]':>9} {'binary [ms]':>12} {'GPX/binary MB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (10_000, 100_000, 1_000_000):
+            path = os.path.join(tmp, f"{n}.gpx")
+            synthetic(n, path)
+            binary = convert(path)
+            gpx_time, gpx_holes = analyse(read_gpx, path)
+            binary_time, binary_holes = analyse(read_track, binary)
+            assert gpx_holes == binary_holes
+            back = convert(binary, os.path.join(tmp, f"{n}_back.gpx"))
+            assert filecmp.cmp(path, back, shallow=False)
+            sizes = f"{os.path.getsize(path) / 2**20:.1f}/"
+            sizes += f"{os.path.getsize(binary) / 2**20:.1f}"
+            print(
+                f"{n:>8} {gpx_time * 1e3:>9.1f} {binary_time * 1e3:>12.1f}"
+                f" {sizes:>14}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the analysis cache: a cold analysis (parse, deduplicate, detect holes)
+against a warm one read back from the cache, on synthetic GPX files with one heart
+rate extension per point.
+
+    python benchmarks/bench_cache.py
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from gpxfix.cache import cached_analyse
+from gpxfix.extensions import Extensions
+from gpxfix.track import Track
+from gpxfix.writer import write_gpx
+
+
+def synthetic(n, path):
+    i = np.arange(n)
+    track = Track(
+        47 + i * 1e-5,
+        8 + i * 1e-5,
+        400.0 + i % 100,
+        1_714_550_400_000_000 + i * 1_000_000 + (i // 1000) * 60_000_000,
+        name="Benchmark",
+        extensions=Extensions.from_payloads(
+            [
+                b"<gpxtpx:TrackPointExtension><gpxtpx:hr>%d</gpxtpx:hr>"
+                b"</gpxtpx:TrackPointExtension>" % (100 + k % 80)
+                for k in range(n)
+            ]
+        ),
+        namespaces={
+            "gpxtpx": "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+        },
+    )
+    write_gpx(track, path)
+
+
+def main():
+    print(f"{'points':>8} {'cold [ms]':>10} {'warm [ms]':>10} {'entry [MB]':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (1_000, 10_000, 100_000, 1_000_000):
+            path = os.path.join(tmp, f"{n}.gpx")
+            synthetic(n, path)
+            cache_dir = os.path.join(tmp, f"cache{n}")
+            start = time.perf_counter()
+            cold = cached_analyse(path, cache_dir=cache_dir)
+            cold_time = time.perf_counter() - start
+            start = time.perf_counter()
+            warm = cached_analyse(path, cache_dir=cache_dir)
+            warm_time = time.perf_counter() - start
+            assert warm.holes == cold.holes
+            assert np.array_equal(warm.track.time, cold.track.time)
+            size = sum(entry.stat().st_size for entry in os.scandir(cache_dir)) / 2**20
+            print(
+                f"{n:>8} {cold_time * 1e3:>10.1f} {warm_time * 1e3:>10.1f}"
+                f" {size:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
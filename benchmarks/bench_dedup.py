@@ -0,0 +1,77 @@
+"""
+Benchmark of the duplicate removal. Shows that the cost per point stays constant
+(i.e., the dedup scales linearly) up to 1M points. The gpxpy-based dedup_segment is
+the reference, it rebuilds a gpxpy segment with the same keep-mask.
+
+    python benchmarks/bench_dedup.py [--max-points 1000000]
+"""
+
+import argparse
+import time
+from itertools import compress
+
+import gpxpy.gpx
+import numpy as np
+
+from gpxfix.dedup import keep_mask
+
+
+def dedup_segment(segment):
+    """
+    Removes duplicates from a gpxpy.gpx.GPXTrackSegment in a single pass. The segment
+    is rebuilt once (only if anything has to be removed). Returns the number of removed
+    points.
+    """
+    points = segment.points
+    n = len(points)
+    lat = np.fromiter((p.latitude for p in points), dtype=np.float64, count=n)
+    lon = np.fromiter((p.longitude for p in points), dtype=np.float64, count=n)
+    keep = keep_mask(lat, lon)
+    removed = n - int(np.count_nonzero(keep))
+    if removed:
+        segment.points = list(compress(points, keep))
+    return removed
+
+
+def synthetic_coordinates(n, duplicate_run=20, seed=0):
+    # Random walk where every 10th point starts a run of stationary duplicates
+    rng = np.random.default_rng(seed)
+    lat = 47.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    lon = 8.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    for start in range(0, n, 10 * duplicate_run):
+        lat[start : start + duplicate_run] = lat[start]
+        lon[start : start + duplicate_run] = lon[start]
+    return lat, lon
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.max_points]
+    print(
+        f"{'points':>10} {'mask [ms]':>10} {'ns/pt':>7} {'segment [ms]':>13} {'ns/pt':>7}"
+    )
+    for n in sizes:
+        lat, lon = synthetic_coordinates(n)
+        mask_time = timed(keep_mask, lat, lon)
+
+        segment = gpxpy.gpx.GPXTrackSegment(
+            [gpxpy.gpx.GPXTrackPoint(a, o) for a, o in zip(lat.tolist(), lon.tolist())]
+        )
+        segment_time = timed(dedup_segment, segment)
+        print(
+            f"{n:>10} {mask_time * 1e3:>10.2f} {mask_time / n * 1e9:>7.1f} "
+            f"{segment_time * 1e3:>13.2f} {segment_time / n * 1e9:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the batched haversine kernel against a Python loop over
+gpxpy.geo.haversine_distance. Also checks that both agree within the documented
+tolerance (see gpxfix.geo).
+
+    python benchmarks/bench_haversine.py [--max-points 1000000]
+"""
+
+import argparse
+import time
+
+import gpxpy.geo
+import numpy as np
+
+from gpxfix.geo import consecutive
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = 47.0 + np.cumsum(rng.normal(0, 1e-3, n))
+    lon = 8.0 + np.cumsum(rng.normal(0, 1e-3, n))
+    return lat, lon
+
+
+def gpxpy_consecutive(lat, lon):
+    lat, lon = lat.tolist(), lon.tolist()
+    return [0.0] + [
+        gpxpy.geo.haversine_distance(lat[i - 1], lon[i - 1], lat[i], lon[i])
+        for i in range(1, len(lat))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.max_points]
+    print(
+        f"{'points':>10} {'gpxpy [ms]':>11} {'numpy [ms]':>11} {'speedup':>8} {'max rel err':>12}"
+    )
+    for n in sizes:
+        lat, lon = random_walk(n)
+
+        start = time.perf_counter()
+        reference = gpxpy_consecutive(lat, lon)
+        gpxpy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = consecutive(lat, lon)
+        numpy_time = time.perf_counter() - start
+
+        reference = np.asarray(reference)
+        rel_err = np.max(np.abs(result - reference)[1:] / reference[1:])
+        print(
+            f"{n:>10} {gpxpy_time * 1e3:>11.2f} {numpy_time * 1e3:>11.2f} "
+            f"{gpxpy_time / numpy_time:>7.0f}x {rel_err:>12.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of matching many snippets to many holes: the grid index of gpxfix.matching
+against comparing every snippet with every hole (the former per-snippet search).
+
+    python benchmarks/bench_matching.py
+"""
+
+import time
+
+import numpy as np
+
+from gpxfix.geo import one_to_many
+from gpxfix.matching import match_snippets
+from gpxfix.track import Track
+
+DIST_THRESHOLD = 400
+
+
+def synthetic(n_holes, points_per_hole=200, seed=0):
+    # Random walk with a ~1.1 km jump at every hole and one snippet per hole
+    rng = np.random.default_rng(seed)
+    n = n_holes * points_per_hole
+    steps = rng.normal(0, 2e-5, (n, 2)) + [3e-5, 1e-5]
+    lat, lon = 47 + np.cumsum(steps[:, 0]), 8 + np.cumsum(steps[:, 1])
+    holes = np.arange(1, n_holes + 1) * points_per_hole - points_per_hole // 2
+    jumps = np.zeros(n)
+    jumps[holes] = 0.01
+    lat += np.cumsum(jumps)
+    track = Track(lat, lon, np.zeros(n), np.arange(n) * 1_000_000)
+    snippets = []
+    for h in rng.permutation(holes):
+        m = 20
+        snippets.append(
+            Track(
+                np.linspace(lat[h - 1], lat[h], m + 2)[1:-1],
+                np.linspace(lon[h - 1], lon[h], m + 2)[1:-1],
+                np.zeros(m),
+                np.zeros(m, dtype=np.int64),
+            )
+        )
+    return track, holes, snippets
+
+
+def brute_force(track, holes, snippets):
+    before = holes - 1
+    return [
+        holes[
+            np.argmin(
+                one_to_many(s.lat[0], s.lon[0], track.lat[before], track.lon[before])
+            )
+        ]
+        for s in snippets
+    ]
+
+
+def main():
+    print(f"{'holes':>7} {'snippets':>9} {'brute force [ms]':>17} {'grid [ms]':>10}")
+    for n_holes in (10, 100, 1000, 10000):
+        track, holes, snippets = synthetic(n_holes)
+        start = time.perf_counter()
+        expected = brute_force(track, holes, snippets)
+        brute = time.perf_counter() - start
+        start = time.perf_counter()
+        matches = match_snippets(track, snippets, holes, DIST_THRESHOLD)
+        grid = time.perf_counter() - start
+        found = {m.snippet: m.position for m in matches}
+        assert [found[i] for i in range(len(snippets))] == list(expected)
+        print(
+            f"{n_holes:>7} {len(snippets):>9} {brute * 1e3:>17.1f} {grid * 1e3:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of core.merge_snippet. The original track is spliced instead of rebuilt and
+the snippet is retimed with array operations (gpxfix.retime), so neither growing the
+track nor growing the snippet adds per-point Python work. core.merge_snippets
+inserts many snippets with a single splice, where merging them one after another
+copies the whole track once per snippet.
+
+    python benchmarks/bench_merge.py
+"""
+
+import time
+
+import numpy as np
+
+from gpxfix.core import find_matches, merge_snippet, merge_snippets
+from gpxfix.track import Track
+
+START = 1_714_550_400_000_000  # 2024-05-01 in epoch microseconds
+
+
+def synthetic_track(n, *holes_at):
+    # Straight ride northwards at ~5.5 m/s with holes of ~1.1 km and 120 s
+    lat = 47.0 + np.arange(n) * 5e-5
+    time = START + np.arange(n) * 1_000_000
+    for hole_at in holes_at:
+        lat[hole_at:] += 0.01
+        time[hole_at:] += 120_000_000
+    return Track(lat, np.full(n, 8.0), np.full(n, 400.0), time, name="bench")
+
+
+def synthetic_snippet(track, hole_at, n):
+    lat = np.linspace(track.lat[hole_at - 1], track.lat[hole_at], n + 2)[1:-1]
+    return Track(lat, np.full(n, 8.0), np.full(n, 400.0), np.zeros(n, dtype=np.int64))
+
+
+def timed(track, snippet, hole_at, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        merge_snippet(track, snippet, holes=[hole_at])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def sequential(track, snippets, holes):
+    # One merge per snippet, from the back so the positions stay valid
+    matches = find_matches(track, snippets, holes)
+    for match in reversed(matches):
+        track, _ = merge_snippet(
+            track, snippets[match.snippet], position=match.position
+        )
+    return track
+
+
+def timed_batch(track, snippets, holes, repeat=3):
+    best = [float("inf"), float("inf")]
+    for _ in range(repeat):
+        start = time.perf_counter()
+        expected = sequential(track, snippets, holes)
+        best[0] = min(best[0], time.perf_counter() - start)
+        start = time.perf_counter()
+        repaired, _ = merge_snippets(track, snippets, holes=holes)
+        best[1] = min(best[1], time.perf_counter() - start)
+        assert np.array_equal(repaired.time, expected.time)
+    return best
+
+
+def main():
+    print(f"{'track pts':>10} {'snippet pts':>12} {'merge [ms]':>11}")
+    for n in (10_000, 100_000, 1_000_000):
+        track = synthetic_track(n, n // 2)
+        snippet = synthetic_snippet(track, n // 2, 50)
+        print(f"{n:>10} {50:>12} {timed(track, snippet, n // 2) * 1e3:>11.2f}")
+    track = synthetic_track(100_000, 50_000)
+    for k in (10, 100, 10_000):
+        snippet = synthetic_snippet(track, 50_000, k)
+        print(f"{100_000:>10} {k:>12} {timed(track, snippet, 50_000) * 1e3:>11.2f}")
+
+    print(
+        f"\n{'track pts':>10} {'snippets':>9} {'one by one [ms]':>16} {'batch [ms]':>11}"
+    )
+    n = 1_000_000
+    for k in (10, 100, 1000):
+        holes = np.linspace(0, n, k + 2).astype(np.int64)[1:-1].tolist()
+        track = synthetic_track(n, *holes)
+        snippets = [synthetic_snippet(track, hole_at, 50) for hole_at in holes]
+        one_by_one, batch = timed_batch(track, snippets, holes)
+        print(f"{n:>10} {k:>9} {one_by_one * 1e3:>16.1f} {batch * 1e3:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
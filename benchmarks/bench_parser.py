@@ -0,0 +1,84 @@
+"""
+Benchmark of the streaming GPX reader against gpxpy.parse + Track.from_gpx. Every
+parser runs in a fresh subprocess so the reported peak RSS is not polluted.
+
+    python benchmarks/bench_parser.py [--points 1000000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<gpx version="1.1" creator="bench" '
+    'xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+    "<trk><name>Benchmark</name><trkseg>\n"
+)
+POINT = (
+    '<trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.1f}</ele>'
+    "<time>{time}Z</time><extensions><gpxtpx:TrackPointExtension>"
+    "<gpxtpx:hr>{hr}</gpxtpx:hr></gpxtpx:TrackPointExtension></extensions></trkpt>\n"
+)
+FOOTER = "</trkseg></trk>\n</gpx>\n"
+
+RUNNER = """
+import resource, sys, time
+start = time.perf_counter()
+if sys.argv[1] == "gpxpy":
+    import gpxpy
+    from gpxfix.track import Track
+    with open(sys.argv[2]) as f:
+        track = Track.from_gpx(gpxpy.parse(f))
+else:
+    from gpxfix.parser import read_gpx
+    track = read_gpx(sys.argv[2])
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(len(track), elapsed, rss)
+"""
+
+
+def write_gpx(path, n):
+    start = time.mktime((2024, 5, 1, 8, 0, 0, 0, 0, 0))
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for i in range(n):
+            f.write(
+                POINT.format(
+                    lat=47 + i * 1e-5,
+                    lon=8 + i * 1e-5,
+                    ele=400 + (i % 100),
+                    time=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start + i)),
+                    hr=100 + i % 80,
+                )
+            )
+        f.write(FOOTER)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.gpx")
+        write_gpx(path, args.points)
+        size = os.path.getsize(path) / 2**20
+        print(f"{args.points} points, {size:.1f} MB")
+        print(f"{'parser':>10} {'time [s]':>9} {'peak RSS [MB]':>14}")
+        for name in ("gpxpy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-c", RUNNER, name, path],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            print(f"{name:>10} {float(out[1]):>9.2f} {float(out[2]):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of the preview: building the level-of-detail pyramid of gpxfix.preview and
+computing frames (800x600 pixels) at increasing zoom, against projecting every point
+of the track for every frame.
+
+    python benchmarks/bench_preview.py
+"""
+
+import time
+
+import numpy as np
+
+from gpxfix.preview import Pyramid, View
+from gpxfix.track import Track
+
+WIDTH, HEIGHT = 800, 600
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 3e-5, (n, 2)) + [2e-5, 1e-5]
+    lat, lon = 47 + np.cumsum(steps[:, 0]), 8 + np.cumsum(steps[:, 1])
+    return Track(lat, lon, np.zeros(n), np.arange(n) * 1_000_000)
+
+
+def main():
+    for n in (100_000, 500_000):
+        track = synthetic(n)
+        holes = np.linspace(1, n - 1, 20).astype(np.int64)
+        start = time.perf_counter()
+        pyramid = Pyramid(track, holes)
+        build = time.perf_counter() - start
+        print(f"{n} points, pyramid {[len(level) for level in pyramid.levels]}")
+        print(f"  built in {build * 1e3:.0f} ms (background thread)")
+        print(
+            f"{'zoom':>8} {'level':>6} {'drawn':>7} {'frame [ms]':>11} {'all [ms]':>9}"
+        )
+        full = View.fit(pyramid.bounds(), WIDTH, HEIGHT)
+        for zoom in (1, 10, 100, 1000):
+            view = full.copy()
+            view.scale *= zoom
+            start = time.perf_counter()
+            lines, _ = pyramid.frame(view)
+            frame = time.perf_counter() - start
+            start = time.perf_counter()
+            sx, sy = view.to_screen(pyramid.x, pyramid.y)
+            np.stack((sx, sy), axis=1).ravel().tolist()
+            everything = time.perf_counter() - start
+            drawn = sum(len(line) for line in lines) // 2
+            print(
+                f"{zoom:>8} {pyramid.level_for(1 / view.scale):>6} {drawn:>7}"
+                f" {frame * 1e3:>11.1f} {everything * 1e3:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
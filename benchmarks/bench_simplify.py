@@ -0,0 +1,75 @@
+"""
+Benchmark of the track simplification: the vectorized Ramer-Douglas-Peucker of
+gpxfix.simplify against a recursive one (one call per split), and the stride
+decimation, on random walks.
+
+    python benchmarks/bench_simplify.py
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from gpxfix.geo import to_cartesian
+from gpxfix.simplify import rdp_mask, stride_mask
+from gpxfix.track import Track
+
+TOLERANCE = 5
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 3e-5, (n, 2)) + [2e-5, 1e-5]
+    lat, lon = 47 + np.cumsum(steps[:, 0]), 8 + np.cumsum(steps[:, 1])
+    return Track(lat, lon, np.zeros(n), np.arange(n) * 1_000_000)
+
+
+def recursive(track, tolerance):
+    xyz = to_cartesian(track.lat, track.lon)
+    mask = np.zeros(len(track), dtype=bool)
+    mask[[0, -1]] = True
+
+    def split(lo, hi):
+        if hi - lo < 2:
+            return
+        chord = xyz[hi] - xyz[lo]
+        offset = xyz[lo + 1 : hi] - xyz[lo]
+        dist = np.linalg.norm(np.cross(offset, chord), axis=1)
+        dist /= np.linalg.norm(chord)
+        ind = int(np.argmax(dist))
+        if dist[ind] > tolerance:
+            mask[lo + 1 + ind] = True
+            split(lo, lo + 1 + ind)
+            split(lo + 1 + ind, hi)
+
+    split(0, len(track) - 1)
+    return mask
+
+
+def main():
+    sys.setrecursionlimit(100_000)
+    print(
+        f"{'points':>8} {'kept':>7} {'recursive [ms]':>15} {'vectorized [ms]':>16}"
+        f" {'stride [ms]':>12}"
+    )
+    for n in (10_000, 100_000, 1_000_000):
+        track = synthetic(n)
+        start = time.perf_counter()
+        expected = recursive(track, TOLERANCE)
+        recursive_time = time.perf_counter() - start
+        start = time.perf_counter()
+        mask = rdp_mask(track, TOLERANCE)
+        rdp_time = time.perf_counter() - start
+        assert (mask == expected).all()
+        start = time.perf_counter()
+        stride_mask(track, 5)
+        stride_time = time.perf_counter() - start
+        print(
+            f"{n:>8} {mask.sum():>7} {recursive_time * 1e3:>15.1f}"
+            f" {rdp_time * 1e3:>16.1f} {stride_time * 1e3:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the cold start: the import time of the command line interface and of the
+GUI module, each measured with -X importtime in fresh subprocesses. Neither may pull in
+the heavy modules (numpy, matplotlib, gpxpy), which are only imported once a file is
+processed. Exits with status 1 if a module is imported or a budget is exceeded.
+
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Import time budgets (ms, median over the repeats)
+BUDGETS = {"gpxfix.cli": 100, "gpxfix.main": 150}
+FORBIDDEN = ("numpy", "matplotlib", "gpxpy", "gpxfix.core")
+
+
+def import_times(module):
+    """Cumulative import time (µs) of every module imported by `import module`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':>12} {'median [ms]':>12} {'budget [ms]':>12}")
+    for module, budget in BUDGETS.items():
+        runs = [import_times(module) for _ in range(args.repeat)]
+        median = sorted(run[module] for run in runs)[len(runs) // 2] / 1e3
+        print(f"{module:>12} {median:>12.1f} {budget:>12}")
+        heavy = sorted(
+            name
+            for name in runs[0]
+            if name.split(".")[0] in FORBIDDEN or name in FORBIDDEN
+        )
+        if heavy:
+            print(f"  {module} imports {', '.join(heavy)}")
+        failed |= bool(heavy) or median > budget
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of the streaming GPX writer against Track.to_gpx().to_xml() plus one write
+call. Every writer runs in a fresh subprocess on the same synthetic track (with one
+heart rate extension per point), the reported memory is the growth of the peak RSS
+while writing.
+
+    python benchmarks/bench_writer.py [--points 300000]
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+
+RUNNER = """
+import resource, sys, time
+import numpy as np
+from gpxfix.extensions import Extensions
+from gpxfix.track import Track
+
+n = int(sys.argv[2])
+i = np.arange(n)
+track = Track(
+    47 + i * 1e-5,
+    8 + i * 1e-5,
+    400.0 + i % 100,
+    1_714_550_400_000_000 + i * 1_000_000,
+    name="Benchmark",
+    extensions=Extensions.from_payloads(
+        [b"<gpxtpx:TrackPointExtension><gpxtpx:hr>%d</gpxtpx:hr>"
+         b"</gpxtpx:TrackPointExtension>" % (100 + k % 80) for k in range(n)]
+    ),
+    namespaces={"gpxtpx": "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"},
+)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+start = time.perf_counter()
+if sys.argv[1] == "to_xml":
+    with open(sys.argv[3], "w") as f:
+        f.write(track.to_gpx().to_xml())
+else:
+    from gpxfix.writer import write_gpx
+    write_gpx(track, sys.argv[3])
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(elapsed, rss - before)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=300_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{args.points} points")
+        print(f"{'writer':>10} {'time [s]':>9} {'RSS growth [MB]':>16} {'MB':>6}")
+        hashes = []
+        for name in ("to_xml", "streaming", "streaming"):
+            path = os.path.join(tmp, f"{name}.gpx")
+            out = subprocess.run(
+                [sys.executable, "-c", RUNNER, name, str(args.points), path],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            size = os.path.getsize(path) / 2**20
+            print(
+                f"{name:>10} {float(out[0]):>9.2f} {float(out[1]):>16.1f} {size:>6.1f}"
+            )
+            with open(path, "rb") as f:
+                hashes.append(hashlib.sha256(f.read()).hexdigest())
+        # Two runs of the streaming writer must give the same bytes
+        print("streaming output stable:", hashes[1] == hashes[2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Benchmark suite of the hot paths on synthetic rides (see synthetic.py) from 1k to 1M
+points: parsing (trackUpload), deduplication, cleaning and hole detection
+(extractParam), activity statistics, repair (Merge, also with all holes at once and by
+interpolation) and writing.
+
+Every run is stored as benchmarks/results/<commit>.json (with a "-dirty" suffix for
+uncommitted changes), so runs of different commits can be compared. --compare
+compares with a stored run (by default the latest one of another commit) and exits
+with 1 if any benchmark got slower than --threshold times.
+
+    python benchmarks/suite.py                         # all benchmarks, all sizes
+    python benchmarks/suite.py --sizes 1000 100000 -k merge
+    python benchmarks/suite.py --compare               # against the previous run
+    python benchmarks/suite.py --compare 1a2b3c4 --no-save
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import synthetic
+from gpxfix import binary, cache, core
+from gpxfix.constants import BINARY_SUFFIX
+from gpxfix.clean import clean_track
+from gpxfix.dedup import dedup_track
+from gpxfix.parser import read_gpx
+from gpxfix.stats import track_stats
+from gpxfix.writer import write_gpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Every benchmark runs at least MIN_REPEAT and at most MAX_REPEAT times, until
+# MIN_TIME seconds are spent
+MIN_REPEAT, MAX_REPEAT, MIN_TIME = 3, 20, 1.0
+
+
+class Ride:
+    """The synthetic ride of one size and everything the benchmarks derive from it."""
+
+    def __init__(self, points, tmp, **spec):
+        self.path = synthetic.gpx_file(points, **spec)
+        self.tmp = tmp
+        self.raw = read_gpx(self.path)
+        self.track, _ = dedup_track(self.raw)
+        self.holes = core.detect_holes(self.track).indices
+        self.snippets = synthetic.snippets(self.track, self.holes)
+        self.binary = os.path.join(tmp, "ride" + BINARY_SUFFIX)
+        binary.write_track(self.track, self.binary)
+
+
+# name: (what it measures, function(ride) returning the function to time)
+BENCHMARKS = {
+    "parse": (
+        "read_gpx (trackUpload)",
+        lambda ride: lambda: read_gpx(ride.path),
+    ),
+    "analyse": (
+        "parse, dedup and holes (trackUpload without cache)",
+        lambda ride: lambda: cache.analyse(ride.path),
+    ),
+    "dedup": (
+        "dedup_track (extractParam)",
+        lambda ride: lambda: dedup_track(ride.raw),
+    ),
+    "clean": (
+        "clean_track (extractParam)",
+        lambda ride: lambda: clean_track(ride.track),
+    ),
+    "kalman": (
+        "clean_track with the Kalman smoother",
+        lambda ride: lambda: clean_track(ride.track, kalman=True),
+    ),
+    "holes": (
+        "detect_holes (extractParam)",
+        lambda ride: lambda: core.detect_holes(ride.track),
+    ),
+    "stats": (
+        "track_stats (scan, trackUpload)",
+        lambda ride: lambda: track_stats(ride.track),
+    ),
+    "merge": (
+        "merge_snippet of one snippet (Merge)",
+        lambda ride: lambda: core.merge_snippet(
+            ride.track, ride.snippets[0], holes=ride.holes
+        ),
+    ),
+    "merge_all": (
+        "merge_snippets of a snippet for every hole",
+        lambda ride: lambda: core.merge_snippets(
+            ride.track, ride.snippets, holes=ride.holes
+        ),
+    ),
+    "fill": (
+        "fill_holes",
+        lambda ride: lambda: core.fill_holes(ride.track, holes=ride.holes),
+    ),
+    "write": (
+        "write_gpx",
+        lambda ride: lambda: write_gpx(ride.track, os.path.join(ride.tmp, "out.gpx")),
+    ),
+    "write_binary": (
+        "binary.write_track",
+        lambda ride: lambda: binary.write_track(
+            ride.track, os.path.join(ride.tmp, "out" + BINARY_SUFFIX)
+        ),
+    ),
+    "load_binary": (
+        "binary.read_track, all columns touched",
+        lambda ride: lambda: binary.read_track(ride.binary).time.sum(),
+    ),
+}
+
+
+def timed(function):
+    times = []
+    spent = 0.0
+    while len(times) < MIN_REPEAT or (spent < MIN_TIME and len(times) < MAX_REPEAT):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        spent += times[-1]
+    return {"min": min(times), "median": statistics.median(times), "runs": len(times)}
+
+
+def git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def label():
+    """Short hash of the checked out commit, "-dirty" if there are changes."""
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = git("status", "--porcelain", "--untracked-files=no")
+    return commit + ("-dirty" if dirty else "")
+
+
+def stored_run(reference, results_dir, current):
+    """The stored run to compare with: by label or the latest of another commit."""
+    if reference:
+        path = os.path.join(results_dir, reference + ".json")
+        if not os.path.exists(path):
+            raise SystemExit(f"No stored run {path}")
+    else:
+        runs = [
+            path
+            for path in glob.glob(os.path.join(results_dir, "*.json"))
+            if os.path.basename(path)[:-5] != current
+        ]
+        if not runs:
+            return None
+        path = max(runs, key=os.path.getmtime)
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(run, reference, threshold):
+    """Prints the ratios to the reference run, returns the regressed benchmarks."""
+    print(f"\ncompared with {reference['label']} ({reference['date']})")
+    if reference["spec"] != run["spec"] or reference["machine"] != run["machine"]:
+        print("(different rides or machine, the ratios may be misleading)")
+    print(f"{'benchmark':>24} {'before [ms]':>12} {'now [ms]':>10} {'ratio':>7}")
+    regressions = []
+    for key, result in run["results"].items():
+        before = reference["results"].get(key)
+        if before is None:
+            continue
+        ratio = result["min"] / before["min"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(
+            f"{key:>24} {before['min'] * 1e3:>12.2f} {result['min'] * 1e3:>10.2f}"
+            f" {ratio:>7.2f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument(
+        "-k", dest="select", nargs="+", help="Only the benchmarks with these names."
+    )
+    parser.add_argument("--holes", type=int, default=10)
+    parser.add_argument("--duplicate-run", type=int, default=5)
+    parser.add_argument("--segments", type=int, default=2)
+    parser.add_argument("--extensions", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true", help="Do not store the run.")
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const="",
+        metavar="LABEL",
+        help="Compare with the stored run LABEL (default: the latest other one).",
+    )
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--list", action="store_true", help="List the benchmarks.")
+    args = parser.parse_args()
+    if args.list:
+        for name, (description, _) in BENCHMARKS.items():
+            print(f"{name:>14}  {description}")
+        return 0
+
+    names = [name for name in BENCHMARKS if not args.select or name in args.select]
+    spec = {
+        "holes": args.holes,
+        "duplicate_run": args.duplicate_run,
+        "segments": args.segments,
+        "extensions": args.extensions,
+        "seed": args.seed,
+    }
+    run = {
+        "label": label(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()} {platform.node()}",
+        "spec": spec,
+        "results": {},
+    }
+
+    print(f"{'benchmark':>24} {'min [ms]':>10} {'median [ms]':>12} {'ns/pt':>8} runs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for points in args.sizes:
+            ride = Ride(points, tmp, **spec)
+            for name in names:
+                result = timed(BENCHMARKS[name][1](ride))
+                key = f"{name}/{points}"
+                run["results"][key] = result
+                print(
+                    f"{key:>24} {result['min'] * 1e3:>10.2f}"
+                    f" {result['median'] * 1e3:>12.2f}"
+                    f" {result['min'] / points * 1e9:>8.0f} {result['runs']:>4}"
+                )
+
+    status = 0
+    if args.compare is not None:
+        reference = stored_run(args.compare, args.results_dir, run["label"])
+        if reference is None:
+            print("\nNo stored run to compare with.")
+        elif compare(run, reference, args.threshold):
+            status = 1
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, run["label"] + ".json")
+        with open(path, "w") as f:
+            json.dump(run, f, indent=1)
+        print(f"\nstored as {path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Deterministic synthetic GPX files for the benchmarks. The same parameters (and seed)
+always give the same file, byte for byte:
+
+    points          number of trackpoints (duplicates included)
+    holes           number of tracking holes (~1.1 km and 120 s each), evenly spaced
+    duplicate_run   length of the runs of points with the same coordinates (0: none),
+                    one run starts every DUPLICATE_EVERY points
+    segments        number of track segments, evenly spaced
+    extensions      fraction of the points with heart rate/cadence extensions
+
+    python benchmarks/synthetic.py out.gpx --points 100000 --holes 10
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+# Bumped whenever the generated files change, so cached files are not reused
+VERSION = 1
+DATA_DIR = os.path.join(tempfile.gettempdir(), "gpxfix-bench")
+DUPLICATE_EVERY = 100
+START = np.datetime64("2024-05-01T08:00:00", "s")
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<gpx version="1.1" creator="gpxfix-bench" '
+    'xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+    "<trk><name>Synthetic ride</name>\n<trkseg>\n"
+)
+POINT = '<trkpt lat="{:.7f}" lon="{:.7f}"><ele>{:.1f}</ele><time>{}Z</time>'
+EXTENSION = (
+    "<extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>{}</gpxtpx:hr>"
+    "<gpxtpx:cad>{}</gpxtpx:cad></gpxtpx:TrackPointExtension></extensions>"
+)
+SEGMENT_BREAK = "</trkseg>\n<trkseg>\n"
+FOOTER = "</trkseg>\n</trk>\n</gpx>\n"
+
+
+def positions(n, count):
+    """count indices evenly spaced inside range(1, n)."""
+    return np.linspace(0, n, count + 2).astype(np.int64)[1:-1]
+
+
+def columns(points, holes=0, duplicate_run=0, segments=1, extensions=1.0, seed=0):
+    """
+    The columns of a synthetic ride (see above): lat, lon, ele, time (datetime64),
+    the mask of the points with extensions and the indices where holes and segments
+    start.
+    """
+    rng = np.random.default_rng(seed)
+    n = points
+    # Random walk north-east at ~4 m/s with 1 s between the points
+    lat = 47.0 + np.cumsum(rng.normal(3e-5, 1e-5, n))
+    lon = 8.0 + np.cumsum(rng.normal(2e-5, 1e-5, n))
+    ele = 400 + 50 * np.sin(np.arange(n) / 2000) + rng.normal(0, 0.3, n)
+    seconds = np.arange(n, dtype=np.int64)
+    if duplicate_run > 0:
+        for start in range(DUPLICATE_EVERY, n, DUPLICATE_EVERY):
+            stop = min(start + duplicate_run, n)
+            lat[start:stop] = lat[start]
+            lon[start:stop] = lon[start]
+    # After the duplicates, so a run cannot swallow a hole
+    hole_at = positions(n, holes)
+    for at in hole_at:
+        lat[at:] += 0.01
+        seconds[at:] += 120
+    with_extensions = rng.random(n) < extensions
+    return {
+        "lat": lat,
+        "lon": lon,
+        "ele": ele,
+        "time": START + seconds,
+        "extensions": with_extensions,
+        "holes": hole_at,
+        "segments": positions(n, segments - 1),
+    }
+
+
+def write_gpx(path, points, **spec):
+    """Writes the synthetic ride (see columns) as GPX 1.1 file."""
+    data = columns(points, **spec)
+    times = np.datetime_as_string(data["time"], unit="s").tolist()
+    hr = (120 + np.arange(points) % 40).tolist()
+    cad = (80 + np.arange(points) % 15).tolist()
+    breaks = set(data["segments"].tolist())
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        rows = zip(
+            data["lat"].tolist(),
+            data["lon"].tolist(),
+            data["ele"].tolist(),
+            times,
+            data["extensions"].tolist(),
+        )
+        for i, (lat, lon, ele, time, extension) in enumerate(rows):
+            if i in breaks:
+                f.write(SEGMENT_BREAK)
+            f.write(POINT.format(lat, lon, ele, time))
+            if extension:
+                f.write(EXTENSION.format(hr[i], cad[i]))
+            f.write("</trkpt>\n")
+        f.write(FOOTER)
+    return path
+
+
+def gpx_file(points, directory=DATA_DIR, **spec):
+    """
+    Path of the synthetic ride with the given parameters in directory, generated on
+    first use (the files are deterministic, so they can be reused).
+    """
+    spec = {
+        "holes": 0,
+        "duplicate_run": 0,
+        "segments": 1,
+        "extensions": 1.0,
+        "seed": 0,
+        **spec,
+    }
+    name = f"v{VERSION}_{points}_" + "_".join(f"{value:g}" for value in spec.values())
+    path = os.path.join(directory, name + ".gpx")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".gpx", dir=directory)
+        os.close(fd)
+        write_gpx(tmp, points, **spec)
+        os.replace(tmp, path)
+    return path
+
+
+def snippets(track, holes, count=50):
+    """Snippets (gpxfix.track.Track) bridging the given holes of a track."""
+    from gpxfix.track import Track
+
+    result = []
+    for at in holes:
+        lat = np.linspace(track.lat[at - 1], track.lat[at], count + 2)[1:-1]
+        lon = np.linspace(track.lon[at - 1], track.lon[at], count + 2)[1:-1]
+        ele = np.full(count, track.ele[at - 1])
+        result.append(Track(lat, lon, ele, np.zeros(count, dtype=np.int64)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path")
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--holes", type=int, default=0)
+    parser.add_argument("--duplicate-run", type=int, default=0)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--extensions", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_gpx(
+        args.path,
+        args.points,
+        holes=args.holes,
+        duplicate_run=args.duplicate_run,
+        segments=args.segments,
+        extensions=args.extensions,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from gpxfix.main import launch
+import sys
 
+from gpxfix.cli import main
 
 if __name__ == "__main__":
-    launch()
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Batch processing of many GPX files. Files are distributed over a process pool in
+chunks and the per-file reports are yielded as soon as they are finished (not in
+input order), so one slow file does not hold back the rest.
+"""
+
+import functools
+import multiprocessing
+import os
+
+from gpxfix import core
+from gpxfix.cache import cached_analyse, evict
+from gpxfix.constants import CACHE_DIR, HR_ZONES
+from gpxfix.stats import track_stats
+
+
+def hole_report(track, holes):
+    """Per-hole summary (indices, sizes and coordinates), as shown in the GUI."""
+    starts = track.segment_starts()
+    return [
+        {
+            "index": ind,
+            "size": round(size, 1),
+            "from": [float(track.lat[ind - 1]), float(track.lon[ind - 1])],
+            "to": [float(track.lat[ind]), float(track.lon[ind])],
+            "between_segments": bool(starts[ind]),
+        }
+        for ind, size in zip(*holes)
+    ]
+
+
+def cleaning_report(cleaning):
+    """Numbers of removed points and replaced elevations (None if not cleaned)."""
+    if cleaning is None:
+        return None
+    return {
+        "removed": len(cleaning["spikes"]) + len(cleaning["outliers"]),
+        "elevations": len(cleaning["elevations"]),
+        "smoothed": cleaning["smoothed"],
+    }
+
+
+def scan_file(
+    path,
+    time_threshold=core.TIME_THRESHOLD,
+    dist_threshold=core.DIST_THRESHOLD,
+    cache_dir=CACHE_DIR,
+    hr_zones=HR_ZONES,
+    clean=False,
+    kalman=False,
+):
+    """
+    Report of a single file, with the number of removed GPS spikes (with clean, see
+    gpxfix.clean) and the activity statistics (see gpxfix.stats). Errors are reported
+    instead of raised. Unchanged files are read from the cache in cache_dir (see
+    gpxfix.cache), None disables it.
+    """
+    try:
+        analysis = cached_analyse(
+            path,
+            time_threshold,
+            dist_threshold,
+            cache_dir=cache_dir,
+            clean=clean,
+            kalman=kalman,
+        )
+        track, holes = analysis.track, analysis.holes
+        stats = track_stats(track, hr_zones=hr_zones)
+    except Exception as error:
+        return {"path": path, "error": f"{type(error).__name__}: {error}"}
+    return {
+        "path": path,
+        "points": len(track),
+        "segments": track.n_segments,
+        "holes": hole_report(track, holes),
+        "cleaning": cleaning_report(analysis.cleaning),
+        "stats": stats,
+    }
+
+
+def default_chunksize(n_files, jobs):
+    # Small enough to balance the load, large enough to amortize the IPC
+    return max(1, min(64, n_files // (4 * jobs)))
+
+
+def scan_files(
+    paths,
+    jobs=1,
+    chunksize=None,
+    time_threshold=core.TIME_THRESHOLD,
+    dist_threshold=core.DIST_THRESHOLD,
+    cache_dir=CACHE_DIR,
+    hr_zones=HR_ZONES,
+    clean=False,
+    kalman=False,
+):
+    """
+    Scans all paths with jobs worker processes (all cores if jobs is 0) and yields the
+    reports in order of completion. The cache is bounded once, after the scan.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    worker = functools.partial(
+        scan_file,
+        time_threshold=time_threshold,
+        dist_threshold=dist_threshold,
+        cache_dir=cache_dir,
+        hr_zones=hr_zones,
+        clean=clean,
+        kalman=kalman,
+    )
+    if jobs == 1 or len(paths) < 2:
+        yield from map(worker, paths)
+    else:
+        chunksize = chunksize or default_chunksize(len(paths), jobs)
+        with multiprocessing.Pool(min(jobs, len(paths))) as pool:
+            yield from pool.imap_unordered(worker, paths, chunksize)
+    if cache_dir is not None:
+        try:
+            evict(cache_dir)
+        except OSError:
+            pass
@@ -0,0 +1,193 @@
+"""
+Binary sidecar format of the columnar track model (see gpxfix.track), for archives
+that are read over and over. A .gpxb file is a small JSON header followed by the raw
+little-endian columns, each aligned to ALIGNMENT bytes:
+
+    MAGIC                       8 bytes
+    header length               uint64
+    header                      JSON: names, namespaces, counts and the byte offset
+                                and dtype of every column
+    lat, lon, ele               float64
+    time                        int64
+    offsets, tracks             int64, the index of segments and tracks
+    extension_offsets           int64
+    extension_data              uint8
+
+read_track memory-maps the file, so the columns are views of the page cache without
+any parsing or copying, and only the pages that are used are ever read. Conversions
+from and to GPX go through gpxfix.parser and gpxfix.writer and round-trip exactly.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from gpxfix.constants import BINARY_SUFFIX as SUFFIX
+from gpxfix.extensions import Extensions
+from gpxfix.parser import read_gpx
+from gpxfix.profiling import count, stage
+from gpxfix.track import Track
+from gpxfix.writer import file_mode, write_gpx
+
+MAGIC = b"GPXFIXB\x01"
+ALIGNMENT = 64
+COLUMNS = {
+    "lat": "<f8",
+    "lon": "<f8",
+    "ele": "<f8",
+    "time": "<i8",
+    "offsets": "<i8",
+    "tracks": "<i8",
+    "extension_offsets": "<i8",
+    "extension_data": "u1",
+}
+
+
+def _columns(track):
+    return {
+        "lat": track.lat,
+        "lon": track.lon,
+        "ele": track.ele,
+        "time": track.time,
+        "offsets": track.offsets,
+        "tracks": track.tracks,
+        "extension_offsets": track.extensions.offsets,
+        "extension_data": track.extensions.data,
+    }
+
+
+def _layout(columns, start):
+    # Byte offset of every column behind a header ending at start
+    layout, position = {}, start
+    for name, values in columns.items():
+        position += -position % ALIGNMENT
+        layout[name] = [position, len(values)]
+        position += len(values) * np.dtype(COLUMNS[name]).itemsize
+    return layout
+
+
+def _header(track, columns):
+    header = {
+        "track_names": track.track_names,
+        "namespaces": track.namespaces,
+        "dtypes": COLUMNS,
+    }
+    # The column offsets depend on the header length, which depends on the offsets
+    layout = {}
+    while True:
+        header["columns"] = layout
+        data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        new = _layout(columns, len(MAGIC) + 8 + len(data))
+        if new == layout:
+            return data
+        layout = new
+
+
+def write_track(track, path):
+    """
+    Writes a gpxfix.track.Track as binary file. Like gpxfix.writer.write_gpx, the
+    file is written next to path first and renamed afterwards.
+    """
+    with stage("write"):
+        _write_track(track, path)
+    count("points written", len(track))
+
+
+def _write_track(track, path):
+    columns = _columns(track)
+    header = _header(track, columns)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).astype("<u8").tobytes())
+            f.write(header)
+            for name, values in columns.items():
+                f.write(b"\0" * (-f.tell() % ALIGNMENT))
+                f.write(np.ascontiguousarray(values, dtype=COLUMNS[name]).data)
+        # mkstemp creates private files, use the permissions of a regular new file
+        os.chmod(tmp_path, file_mode(os.path.dirname(os.path.abspath(path))))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_header(path):
+    """JSON header of a binary file (names, namespaces and column layout)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a gpxfix binary track.")
+        size = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+        return json.loads(f.read(size))
+
+
+def read_track(path, mmap=True):
+    """
+    Reads a binary file into a gpxfix.track.Track. With mmap, the columns are
+    read-only views of the memory-mapped file (operations on the track that change
+    points, e.g. Track.insert, create new arrays anyway), else they are read into
+    memory.
+    """
+    with stage("read binary"):
+        track = _read_track(path, mmap)
+    count("points loaded", len(track))
+    return track
+
+
+def _read_track(path, mmap):
+    header = read_header(path)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        with open(path, "rb") as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    columns = {}
+    for name, (start, count) in header["columns"].items():
+        dtype = np.dtype(header["dtypes"][name])
+        stop = start + count * dtype.itemsize
+        if stop > len(buffer):
+            raise ValueError(f"{path} is truncated.")
+        columns[name] = buffer[start:stop].view(dtype)
+    return Track(
+        columns["lat"],
+        columns["lon"],
+        columns["ele"],
+        columns["time"],
+        offsets=columns["offsets"],
+        extensions=Extensions(columns["extension_data"], columns["extension_offsets"]),
+        namespaces=header["namespaces"],
+        tracks=columns["tracks"],
+        track_names=header["track_names"],
+    )
+
+
+def is_binary(path):
+    """Whether path is a binary track (by its suffix)."""
+    return str(path).lower().endswith(SUFFIX)
+
+
+def sidecar_path(path):
+    """Path of the binary file next to a GPX file (and vice versa)."""
+    root, ext = os.path.splitext(path)
+    return root + (".gpx" if ext.lower() == SUFFIX else SUFFIX)
+
+
+def convert(source, target=None):
+    """
+    Converts a GPX file into a binary file or a binary file back into GPX, depending
+    on the suffix of source. By default, the result is written next to source (see
+    sidecar_path). Returns the path of the result.
+    """
+    target = target or sidecar_path(source)
+    if is_binary(source):
+        write_gpx(read_track(source), target)
+    else:
+        write_track(read_gpx(source), target)
+    return target
@@ -0,0 +1,221 @@
+"""
+On-disk cache of analysed GPX files. An entry holds the deduplicated (and optionally
+cleaned) columnar track (see gpxfix.track), the per-segment duplicate counts, the
+cleaning report and the holes of one file, stored as uncompressed .npz file. Entries
+are keyed by the SHA-256 of the file content, the hole thresholds and the cleaning
+options, so an unchanged file is never parsed twice, wherever it is stored.
+
+The cache is bounded: once it grows beyond its size limit, the least recently used
+entries are removed (every hit refreshes the modification time of its entry). Entries
+are written atomically, so several processes (see gpxfix.batch) can share the cache.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+from gpxfix.clean import clean_track
+from gpxfix.constants import CACHE_DIR, CACHE_SIZE, DIST_THRESHOLD, TIME_THRESHOLD
+from gpxfix.core import Holes, detect_holes, load
+from gpxfix.dedup import dedup_track
+from gpxfix.extensions import Extensions
+from gpxfix.parser import READ_SIZE
+from gpxfix.profiling import count
+from gpxfix.track import Track
+
+# Version of the entry layout (and of what is parsed into it), part of the key so
+# old entries are never read
+FORMAT = 3
+SUFFIX = ".npz"
+
+# duplicates: per-segment removal counts of gpxfix.dedup.dedup_track,
+# cleaning: report of gpxfix.clean.clean_track (None if not cleaned),
+# holes: gpxfix.core.Holes of the deduplicated (and cleaned) track
+Analysis = namedtuple("Analysis", ["track", "duplicates", "cleaning", "holes"])
+
+
+def file_hash(path):
+    """SHA-256 (hex) of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        data = f.read(READ_SIZE)
+        while data:
+            digest.update(data)
+            data = f.read(READ_SIZE)
+    return digest.hexdigest()
+
+
+def entry_key(digest, time_threshold, dist_threshold, clean=False, kalman=False):
+    """
+    Name of the cache entry of a file content (digest), hole thresholds and cleaning
+    options.
+    """
+    key = (
+        f"{FORMAT}:{digest}:{float(time_threshold)!r}:{float(dist_threshold)!r}"
+        f":{bool(clean)}:{bool(kalman)}"
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def analyse(
+    path,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+    progress=None,
+    clean=False,
+    kalman=False,
+):
+    """
+    Parses, deduplicates, cleans (with clean, see gpxfix.clean) and analyses a GPX
+    (or binary) file, see Analysis. progress is passed on to
+    gpxfix.parser.read_gpx.
+    """
+    track, duplicates = dedup_track(load(path, dedup=False, progress=progress))
+    cleaning = None
+    if clean or kalman:
+        track, cleaning = clean_track(
+            track,
+            gating=clean,
+            median=clean,
+            kalman=kalman,
+            time_threshold=time_threshold,
+        )
+    return Analysis(
+        track,
+        duplicates,
+        cleaning,
+        detect_holes(track, time_threshold, dist_threshold),
+    )
+
+
+def save_entry(path, analysis):
+    """Writes an Analysis as .npz file (atomically, like gpxfix.writer)."""
+    track = analysis.track
+    meta = {
+        "track_names": track.track_names,
+        "namespaces": track.namespaces,
+        "duplicates": list(analysis.duplicates),
+        "cleaning": analysis.cleaning,
+    }
+    arrays = {
+        "lat": track.lat,
+        "lon": track.lon,
+        "ele": track.ele,
+        "time": track.time,
+        "offsets": track.offsets,
+        "tracks": track.tracks,
+        "extension_data": track.extensions.data,
+        "extension_offsets": track.extensions.offsets,
+        "hole_indices": np.asarray(analysis.holes.indices, dtype=np.int64),
+        "hole_sizes": np.asarray(analysis.holes.sizes, dtype=np.float64),
+        "meta": np.array(json.dumps(meta)),
+    }
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_entry(path):
+    """Reads an Analysis written by save_entry."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data["meta"].item())
+        track = Track(
+            data["lat"],
+            data["lon"],
+            data["ele"],
+            data["time"],
+            offsets=data["offsets"],
+            extensions=Extensions(data["extension_data"], data["extension_offsets"]),
+            namespaces=meta["namespaces"],
+            tracks=data["tracks"],
+            track_names=meta["track_names"],
+        )
+        holes = Holes(data["hole_indices"].tolist(), data["hole_sizes"].tolist())
+    return Analysis(track, meta["duplicates"], meta["cleaning"], holes)
+
+
+def evict(cache_dir=CACHE_DIR, max_size=CACHE_SIZE):
+    """
+    Removes the least recently used entries until the cache is at most max_size
+    bytes. Returns the number of removed entries.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            try:
+                if entry.name.endswith(SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                # Removed by another process in the meantime
+                pass
+    entries.sort(reverse=True)
+    removed, total = 0, 0
+    for _, size, path in entries:
+        total += size
+        if total > max_size:
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def clear(cache_dir=CACHE_DIR):
+    """Removes all entries. Returns the number of removed entries."""
+    return evict(cache_dir, max_size=-1)
+
+
+def cached_analyse(
+    path,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+    cache_dir=CACHE_DIR,
+    progress=None,
+    clean=False,
+    kalman=False,
+):
+    """
+    Analysis of a GPX file (see analyse), read from the cache if the file content
+    was analysed with the same thresholds and cleaning options before. Without
+    cache_dir, nothing is cached. The cache is best effort: unreadable entries are
+    replaced and a cache directory that cannot be written only costs the speedup.
+    The cache is not bounded here, callers run evict once they are done.
+    """
+    if cache_dir is None:
+        return analyse(path, time_threshold, dist_threshold, progress, clean, kalman)
+    key = entry_key(file_hash(path), time_threshold, dist_threshold, clean, kalman)
+    entry = os.path.join(cache_dir, key + SUFFIX)
+    try:
+        analysis = load_entry(entry)
+        # Mark the entry as recently used
+        os.utime(entry)
+        count("cache hits")
+        return analysis
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # Missing, truncated or foreign entry, (re)written below
+        pass
+
+    count("cache misses")
+    analysis = analyse(path, time_threshold, dist_threshold, progress, clean, kalman)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_entry(entry, analysis)
+    except OSError:
+        pass
+    return analysis
@@ -0,0 +1,300 @@
+"""
+Removal of GPS outliers, run after the duplicate removal (see gpxfix.dedup) and
+before the hole detection. Devices produce "teleport" spikes: single points hundreds
+of meters off the track, which would be detected as holes. The cleaning stages work
+on whole columns and never across segment boundaries:
+
+    gating      drops points whose steps to AND from their neighbours are faster than
+                max_speed or need more than max_acceleration, while the direct step
+                from the previous to the next point is plausible (holes, which are a
+                single long step, are never touched)
+    median      drops points further from the rolling median position than distance
+                (and factor times the median step length in the window, so sparse
+                tracks and GoogleMaps snippets are safe), and replaces elevations
+                more than elevation away from the rolling median by the median
+    kalman      optional constant-velocity Kalman (RTS) smoother of the positions,
+                restarted at every gap longer than time_threshold
+
+clean_track returns the cleaned track and a report with the indices (in the input
+track) of the dropped points and the replaced elevations.
+"""
+
+import numpy as np
+
+from gpxfix.constants import (
+    ELEVATION_SPIKE,
+    KALMAN_ACCELERATION,
+    KALMAN_NOISE,
+    MEDIAN_DISTANCE,
+    MEDIAN_FACTOR,
+    MEDIAN_WINDOW,
+    SPIKE_ACCELERATION,
+    SPIKE_SPEED,
+    TIME_THRESHOLD,
+)
+from gpxfix.geo import EARTH_RADIUS, haversine
+from gpxfix.profiling import count, stage
+from gpxfix.track import NO_TIME
+
+# Maximal number of gating passes (a pass removes the spikes whose neighbours are
+# fine, the next one the spikes that were next to them)
+GATING_PASSES = 3
+# Composed maps of the Kalman scans below this norm no longer change the states
+_NEGLIGIBLE = 1e-12
+
+
+def _segment_bounds(track):
+    """First and last index of the segment of every point."""
+    lengths = np.diff(track.offsets)
+    first = np.repeat(track.offsets[:-1], lengths)
+    return first, np.repeat(track.offsets[1:] - 1, lengths)
+
+
+def spike_mask(
+    track, max_speed=SPIKE_SPEED, max_acceleration=SPIKE_ACCELERATION, passes=None
+):
+    """Mask of the points the speed/acceleration gating drops, see above."""
+    n = len(track)
+    spikes = np.zeros(n, dtype=bool)
+    segment = np.repeat(np.arange(track.n_segments), np.diff(track.offsets))
+    timed = track.time != NO_TIME
+    seconds = track.time / 1e6
+    for _ in range(passes or GATING_PASSES):
+        kept = np.flatnonzero(~spikes & timed)
+        if len(kept) < 3:
+            break
+        prev, point, after = kept[:-2], kept[1:-1], kept[2:]
+        same = (segment[prev] == segment[point]) & (segment[point] == segment[after])
+        dt_in = seconds[point] - seconds[prev]
+        dt_out = seconds[after] - seconds[point]
+        candidate = same & (dt_in > 0) & (dt_out > 0)
+        prev, point, after = prev[candidate], point[candidate], after[candidate]
+        dt_in, dt_out = dt_in[candidate], dt_out[candidate]
+        lat, lon = track.lat, track.lon
+        speed_in = haversine(lat[prev], lon[prev], lat[point], lon[point]) / dt_in
+        speed_out = haversine(lat[point], lon[point], lat[after], lon[after]) / dt_out
+        bypass = haversine(lat[prev], lon[prev], lat[after], lon[after]) / (
+            dt_in + dt_out
+        )
+        too_fast = (speed_in > max_speed) & (speed_out > max_speed)
+        too_fast &= bypass <= max_speed
+        jerky = (speed_in - bypass) / dt_in > max_acceleration
+        jerky &= (speed_out - bypass) / dt_out > max_acceleration
+        found = point[too_fast | jerky]
+        if not len(found):
+            break
+        spikes[found] = True
+    return spikes
+
+
+def _windows(track, window):
+    """Indices of the rolling window around every point, clipped to its segment."""
+    half = max(int(window), 1) // 2
+    first, last = _segment_bounds(track)
+    idx = np.arange(len(track))[:, None] + np.arange(-half, half + 1)
+    return np.clip(idx, first[:, None], last[:, None])
+
+
+def median_outliers(
+    track, window=MEDIAN_WINDOW, distance=MEDIAN_DISTANCE, factor=MEDIAN_FACTOR
+):
+    """Mask of the points far from the rolling median position, see above."""
+    n = len(track)
+    if n < 3:
+        return np.zeros(n, dtype=bool)
+    idx = _windows(track, window)
+    lat, lon = track.lat, track.lon
+    off = haversine(lat, lon, np.median(lat[idx], axis=1), np.median(lon[idx], axis=1))
+    # Length of the step to every point (from it for the first point of a segment)
+    first, last = _segment_bounds(track)
+    step = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    steps = np.concatenate(([0.0], step))
+    starts = first == np.arange(n)
+    steps[starts] = np.concatenate((step, [0.0]))[starts]
+    scale = factor * np.median(steps[idx], axis=1)
+    return off > np.maximum(distance, scale)
+
+
+def elevation_spikes(track, window=MEDIAN_WINDOW, threshold=ELEVATION_SPIKE):
+    """
+    Elevations with the spikes replaced by the rolling median and the mask of the
+    replaced ones. Windows with missing elevations are left alone.
+    """
+    ele = track.ele
+    if len(ele) < 3:
+        return ele, np.zeros(len(ele), dtype=bool)
+    median = np.median(ele[_windows(track, window)], axis=1)
+    spikes = np.abs(ele - median) > threshold
+    return np.where(spikes, median, ele), spikes
+
+
+def _affine_scan(M, c):
+    """
+    All states of the recursion s[i] = M[i] @ s[i - 1] + c[i] with s[-1] = 0, for
+    2x2 matrices M (as the columns m00, m01, m10, m11) and states of two rows (c[0],
+    c[1], each of shape (n, k)). Affine maps compose into affine maps, so the prefixes
+    are composed with a parallel scan (log2(n) vectorized passes) instead of a loop.
+    For contracting maps (like a stable filter), the scan stops as soon as all
+    composed maps are negligible, after log2 of the memory of the recursion.
+    """
+    m00, m01, m10, m11 = (column.copy() for column in M)
+    c0, c1 = c[0].copy(), c[1].copy()
+    shift = 1
+    while shift < len(m00):
+        # Compose the prefix ending at i - shift with the part (i - shift, i]
+        a, b, d, e = (
+            m00[shift:, None],
+            m01[shift:, None],
+            m10[shift:, None],
+            m11[shift:, None],
+        )
+        prev0, prev1 = c0[:-shift], c1[:-shift]
+        c0[shift:], c1[shift:] = (
+            a * prev0 + b * prev1 + c0[shift:],
+            d * prev0 + e * prev1 + c1[shift:],
+        )
+        a, b, d, e = a[:, 0], b[:, 0], d[:, 0], e[:, 0]
+        p00, p01, p10, p11 = m00[:-shift], m01[:-shift], m10[:-shift], m11[:-shift]
+        m00[shift:], m01[shift:], m10[shift:], m11[shift:] = (
+            a * p00 + b * p10,
+            a * p01 + b * p11,
+            d * p00 + e * p10,
+            d * p01 + e * p11,
+        )
+        shift *= 2
+        if max(np.abs(column).max() for column in (m00, m01, m10, m11)) < _NEGLIGIBLE:
+            break
+    return c0, c1
+
+
+def _steady_gains(dt, noise, acceleration):
+    """Steady-state Kalman and RTS smoother gains of the constant-velocity model."""
+    A = np.array([[1.0, dt], [0.0, 1.0]])
+    Q = acceleration**2 * np.array([[dt**4 / 4, dt**3 / 2], [dt**3 / 2, dt**2]])
+    P = np.diag([noise**2, 1e4])
+    for _ in range(500):
+        predicted = A @ P @ A.T + Q
+        K = predicted[:, 0] / (predicted[0, 0] + noise**2)
+        P = predicted - np.outer(K, predicted[0])
+    return K, P @ A.T @ np.linalg.inv(predicted)
+
+
+def kalman_smooth(
+    track,
+    noise=KALMAN_NOISE,
+    acceleration=KALMAN_ACCELERATION,
+    time_threshold=TIME_THRESHOLD,
+):
+    """
+    Smoothed latitudes and longitudes (see above). noise is the standard deviation of
+    the GPS positions (m), acceleration the one of the motion (m/s^2). The gains are
+    the steady-state ones at the median sampling interval. Tracks with missing
+    timestamps are returned unchanged.
+    """
+    n = len(track)
+    if n < 3 or (track.time == NO_TIME).any():
+        return track.lat, track.lon
+    # Local metric coordinates (x east, y north), one column per axis
+    lat0, lon0 = np.median(track.lat), np.median(track.lon)
+    scale = np.cos(np.radians(lat0))
+    z = np.stack(
+        (
+            EARTH_RADIUS * np.radians(track.lon - lon0) * scale,
+            EARTH_RADIUS * np.radians(track.lat - lat0),
+        ),
+        axis=1,
+    )
+    dt = np.zeros(n)
+    dt[1:] = np.diff(track.time) / 1e6
+    positive = dt[dt > 0]
+    nominal = np.median(positive) if len(positive) else 1.0
+    K, C = _steady_gains(nominal, noise, acceleration)
+    # The filter restarts (at the measured position, at rest) after gaps
+    restart = track.segment_starts() | (dt > time_threshold) | (dt < 0)
+    restart[0] = True
+
+    # Forward filter: s[k] = (I - K H) A[k] s[k - 1] + K z[k] with the state
+    # s = (position, velocity) and A[k] = [[1, dt[k]], [0, 1]]
+    ones, zeros = np.ones(n), np.zeros(n)
+    M = [(1 - K[0]) * ones, (1 - K[0]) * dt, -K[1] * ones, 1 - K[1] * dt]
+    c = [K[0] * z, K[1] * z]
+    for column in M:
+        column[restart] = 0
+    c[0][restart], c[1][restart] = z[restart], 0
+    f0, f1 = _affine_scan(M, c)
+
+    # Backward smoother: s[k] = C s[k + 1] + (I - C A[k + 1]) f[k], run reversed
+    last = np.append(restart[1:], True)
+    following = np.append(dt[1:], 0.0)[:, None]
+    M = [C[0, 0] * ones, C[0, 1] * ones, C[1, 0] * ones, C[1, 1] * ones]
+    c = [
+        (1 - C[0, 0]) * f0 - (C[0, 0] * following + C[0, 1]) * f1,
+        -C[1, 0] * f0 + (1 - C[1, 0] * following - C[1, 1]) * f1,
+    ]
+    for column in M:
+        column[last] = 0
+    c[0][last], c[1][last] = f0[last], f1[last]
+    position, _ = _affine_scan(
+        [column[::-1] for column in M], [rows[::-1] for rows in c]
+    )
+    x, y = position[::-1].T
+
+    lat = lat0 + np.degrees(y / EARTH_RADIUS)
+    lon = lon0 + np.degrees(x / (EARTH_RADIUS * scale))
+    return lat, lon
+
+
+def clean_track(
+    track,
+    gating=True,
+    median=True,
+    kalman=False,
+    max_speed=SPIKE_SPEED,
+    max_acceleration=SPIKE_ACCELERATION,
+    window=MEDIAN_WINDOW,
+    distance=MEDIAN_DISTANCE,
+    elevation=ELEVATION_SPIKE,
+    time_threshold=TIME_THRESHOLD,
+):
+    """
+    Cleans a track with the enabled stages (see above). Returns the cleaned track and
+    a report with the input indices of the points dropped by the gating ("spikes")
+    and the median filter ("outliers"), of the replaced elevations ("elevations") and
+    whether the positions were smoothed ("smoothed").
+    """
+    with stage("clean"):
+        spikes = outliers = elevations = np.zeros(0, dtype=np.int64)
+        keep = np.ones(len(track), dtype=bool)
+        if gating:
+            mask = spike_mask(track, max_speed, max_acceleration)
+            spikes = np.flatnonzero(mask)
+            keep &= ~mask
+        cleaned = track.select(keep) if not keep.all() else track
+        if median:
+            mask = median_outliers(cleaned, window, distance)
+            outliers = np.flatnonzero(keep)[mask]
+            if mask.any():
+                keep[outliers] = False
+                cleaned = cleaned.select(~mask)
+            ele, mask = elevation_spikes(cleaned, window, elevation)
+            if mask.any():
+                # Copy, the columns of the input track are never changed
+                if cleaned is track:
+                    cleaned = track.select(slice(None))
+                cleaned.ele = ele
+                elevations = np.flatnonzero(keep)[mask]
+        smoothed = False
+        if kalman:
+            lat, lon = kalman_smooth(cleaned, time_threshold=time_threshold)
+            smoothed = lat is not cleaned.lat
+            if smoothed:
+                if cleaned is track:
+                    cleaned = track.select(slice(None))
+                cleaned.lat, cleaned.lon = lat, lon
+    count("spikes removed", len(spikes) + len(outliers))
+    return cleaned, {
+        "spikes": spikes.tolist(),
+        "outliers": outliers.tolist(),
+        "elevations": elevations.tolist(),
+        "smoothed": smoothed,
+    }
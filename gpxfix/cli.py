@@ -0,0 +1,466 @@
+"""
+Command line interface. Without a subcommand, the GUI is launched.
+
+    gpxfix                                       # GUI
+    gpxfix scan rides/                           # report tracking holes
+    gpxfix scan --jobs 32 --json archive/        # parallel scan, JSON Lines output
+    gpxfix repair rides/ -s snippets/ -o fixed/  # insert matching snippets
+    gpxfix fill rides/ --spacing 10 -o fixed/    # interpolate all holes
+    gpxfix convert archive/                      # binary sidecars (.gpxb) for reuse
+    gpxfix simplify rides/ --tolerance 5         # fewer points for sharing
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from gpxfix.constants import (
+    BINARY_SUFFIX,
+    CACHE_DIR,
+    DEFAULT_SPEED,
+    DIST_THRESHOLD,
+    FILL_SPACING,
+    HR_ZONES,
+    OUTPUT_DIR,
+    PROFILE_ENV,
+    PROFILE_STATS_ENV,
+    PROFILES,
+    SIMPLIFY_METHODS,
+    SIMPLIFY_TOLERANCE,
+    TIME_THRESHOLD,
+)
+
+
+def gpx_files(paths):
+    """
+    Expands files and directories (recursively) into a sorted list of GPX files and
+    binary tracks (see gpxfix.binary).
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in names
+                    if name.lower().endswith((".gpx", BINARY_SUFFIX))
+                )
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def positive_float(text):
+    """argparse type of distances, speeds and spacings."""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be positive: {text}")
+    return value
+
+
+# The engine (and with it numpy) is only imported by the subcommands, so that
+# --help and the GUI start without it.
+
+
+def scan(args):
+    from gpxfix.batch import scan_files
+    from gpxfix.stats import summary
+
+    status = 0
+    reports = scan_files(
+        gpx_files(args.paths),
+        jobs=args.jobs,
+        chunksize=args.chunksize,
+        time_threshold=args.time_threshold,
+        dist_threshold=args.dist_threshold,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        hr_zones=sorted(args.hr_zones),
+        clean=args.clean,
+        kalman=args.kalman,
+    )
+    for report in reports:
+        if "error" in report:
+            status = 1
+        if args.json:
+            print(json.dumps(report), flush=True)
+        elif "error" in report:
+            print(f"{report['path']}: ERROR {report['error']}", file=sys.stderr)
+        else:
+            print(f"{report['path']}: {len(report['holes'])} hole(s)", flush=True)
+            print(f"  {summary(report['stats'])}")
+            cleaning = report["cleaning"]
+            if cleaning and cleaning["removed"]:
+                print(f"  Removed {cleaning['removed']} GPS spike(s)")
+            for run, hole in enumerate(report["holes"]):
+                print(
+                    f"  Hole #{run + 1}: {hole['from'][0]:.4f},{hole['from'][1]:.4f}"
+                    f" -> {hole['to'][0]:.4f},{hole['to'][1]:.4f} ({hole['size']} m)"
+                    + (" between segments" if hole["between_segments"] else "")
+                )
+    return status
+
+
+def repair(args):
+    from gpxfix import core
+
+    snippets = [core.load(path) for path in gpx_files(args.snippets)]
+    distances = args.distance or []
+    if distances and len(distances) != len(snippets):
+        print("Pass either no --distance or one per snippet.", file=sys.stderr)
+        return 2
+
+    status = 0
+    # Output paths of this run, files with the same name must not overwrite each other
+    written = set()
+    for path in gpx_files(args.paths):
+        try:
+            track = core.load(path, clean=args.clean, kalman=args.kalman)
+            # All snippets are matched and spliced in at once, see merge_snippets
+            track, info = core.merge_snippets(
+                track,
+                snippets,
+                distances=distances or None,
+                time_threshold=args.time_threshold,
+                dist_threshold=args.dist_threshold,
+                profile=args.speed_profile,
+                speed=args.speed / 3.6,
+                fill=args.fill,
+                spacing=args.spacing,
+            )
+            repaired = len(info["snippets"])
+            if not info["positions"]:
+                print(f"{path}: no matching snippet")
+                continue
+            out_path = core.repaired_path(
+                track, args.output_dir, source=path, taken=written
+            )
+            core.write(track, out_path)
+        except Exception as error:
+            print(f"{path}: ERROR {error}", file=sys.stderr)
+            status = 1
+            continue
+        filled = f", filled {len(info['filled'])} hole(s)" if args.fill else ""
+        print(f"{path}: inserted {repaired} snippet(s){filled} -> {out_path}")
+    return status
+
+
+def fill(args):
+    from gpxfix import core
+
+    status = 0
+    # Output paths of this run, files with the same name must not overwrite each other
+    written = set()
+    for path in gpx_files(args.paths):
+        try:
+            track = core.load(path, clean=args.clean, kalman=args.kalman)
+            track, info = core.fill_holes(
+                track,
+                spacing=args.spacing,
+                time_threshold=args.time_threshold,
+                dist_threshold=args.dist_threshold,
+            )
+            if not info["positions"]:
+                print(f"{path}: no holes")
+                continue
+            out_path = core.repaired_path(
+                track, args.output_dir, source=path, taken=written
+            )
+            core.write(track, out_path)
+        except Exception as error:
+            print(f"{path}: ERROR {error}", file=sys.stderr)
+            status = 1
+            continue
+        print(
+            f"{path}: filled {len(info['positions'])} hole(s) with "
+            f"{sum(info['counts'])} point(s) -> {out_path}"
+        )
+    return status
+
+
+def simplify(args):
+    from gpxfix import core
+
+    status = 0
+    # Output paths of this run, files with the same name must not overwrite each other
+    written = set()
+    for path in gpx_files(args.paths):
+        try:
+            track = core.load(path, clean=args.clean, kalman=args.kalman)
+            simplified, info = core.simplify_track(
+                track,
+                args.method,
+                tolerance=args.tolerance,
+                stride=args.stride,
+                keep_extensions=not args.thin_extensions,
+                time_threshold=args.time_threshold,
+                dist_threshold=args.dist_threshold,
+            )
+            out_path = core.repaired_path(
+                track, args.output_dir, "_simplified.gpx", source=path, taken=written
+            )
+            core.write(simplified, out_path)
+        except Exception as error:
+            print(f"{path}: ERROR {error}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"{path}: {len(track)} -> {len(simplified)} point(s) -> {out_path}")
+    return status
+
+
+def convert(args):
+    from gpxfix.binary import convert as convert_file
+    from gpxfix.binary import is_binary, sidecar_path
+
+    status = 0
+    for path in gpx_files(args.paths):
+        # Only the requested direction, a directory may contain both
+        if is_binary(path) != args.to_gpx:
+            continue
+        target = sidecar_path(path)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            target = os.path.join(args.output_dir, os.path.basename(target))
+        try:
+            convert_file(path, target)
+        except Exception as error:
+            print(f"{path}: ERROR {error}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"{path} -> {target}")
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="gpxfix", description="Repair GPX tracks with missing sections."
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="Write a JSON report with the time spent per stage, counters and the "
+        f"peak memory to REPORT (- for stderr). Also set by ${PROFILE_ENV}.",
+    )
+    parser.add_argument(
+        "--profile-stats",
+        metavar="FILE",
+        help=f"Dump cProfile stats to FILE. Also set by ${PROFILE_STATS_ENV}.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    thresholds = argparse.ArgumentParser(add_help=False)
+    thresholds.add_argument(
+        "--time-threshold",
+        type=float,
+        default=TIME_THRESHOLD,
+        help="Minimal gap without trackpoints (in s) to count as hole.",
+    )
+    thresholds.add_argument(
+        "--dist-threshold",
+        type=float,
+        default=DIST_THRESHOLD,
+        help="Minimal gap distance (in m) to count as hole.",
+    )
+    thresholds.add_argument(
+        "--clean",
+        action="store_true",
+        help="Remove GPS spikes and outliers before the holes are detected.",
+    )
+    thresholds.add_argument(
+        "--kalman",
+        action="store_true",
+        help="Smooth the positions with a Kalman smoother before the holes are "
+        "detected.",
+    )
+
+    scan_parser = subparsers.add_parser(
+        "scan", parents=[thresholds], help="Report the tracking holes of GPX files."
+    )
+    scan_parser.add_argument("paths", nargs="+", help="GPX files or directories.")
+    scan_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 uses all cores).",
+    )
+    scan_parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Number of files handed to a worker at once (default: automatic).",
+    )
+    scan_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print one JSON object per file (JSON Lines), in order of completion.",
+    )
+    scan_parser.add_argument(
+        "--cache-dir",
+        default=CACHE_DIR,
+        help="Cache of analysed files, unchanged files are not parsed again.",
+    )
+    scan_parser.add_argument(
+        "--no-cache", action="store_true", help="Neither read nor fill the cache."
+    )
+    scan_parser.add_argument(
+        "--hr-zones",
+        nargs="+",
+        type=float,
+        default=HR_ZONES,
+        metavar="BPM",
+        help="Lower bounds of the heart rate zones 2, 3, ... (default: "
+        + " ".join(map(str, HR_ZONES))
+        + ").",
+    )
+    scan_parser.set_defaults(func=scan)
+
+    repair_parser = subparsers.add_parser(
+        "repair", parents=[thresholds], help="Insert snippets into GPX files."
+    )
+    repair_parser.add_argument("paths", nargs="+", help="GPX files or directories.")
+    repair_parser.add_argument(
+        "-s",
+        "--snippets",
+        nargs="+",
+        required=True,
+        help="Snippet GPX files or directories. Each snippet is inserted into the "
+        "hole it matches.",
+    )
+    repair_parser.add_argument(
+        "-d",
+        "--distance",
+        nargs="+",
+        type=positive_float,
+        help="GoogleMaps distance (in m) of every snippet. Defaults to the length "
+        "of the snippets.",
+    )
+    repair_parser.add_argument(
+        "--speed-profile",
+        choices=PROFILES,
+        default="distance",
+        help="How the snippet timestamps are derived: from the GoogleMaps distance "
+        "and the time gap, at a constant --speed or from the speed of the track "
+        "around the hole (default: distance).",
+    )
+    repair_parser.add_argument(
+        "--speed",
+        type=positive_float,
+        default=DEFAULT_SPEED * 3.6,
+        help="Speed (in km/h) of the constant profile and for snippets at the "
+        "start/end of a track (default: 15).",
+    )
+    repair_parser.add_argument(
+        "--fill",
+        action="store_true",
+        help="Interpolate the holes no snippet matches, in the same pass.",
+    )
+    repair_parser.add_argument(
+        "--spacing",
+        type=positive_float,
+        default=FILL_SPACING,
+        help="Distance (in m) between the interpolated points of --fill.",
+    )
+    repair_parser.add_argument(
+        "-o", "--output-dir", default=OUTPUT_DIR, help="Output directory."
+    )
+    repair_parser.set_defaults(func=repair)
+
+    fill_parser = subparsers.add_parser(
+        "fill",
+        parents=[thresholds],
+        help="Fill all holes of GPX files by interpolation (no snippets needed).",
+    )
+    fill_parser.add_argument("paths", nargs="+", help="GPX files or directories.")
+    fill_parser.add_argument(
+        "--spacing",
+        type=positive_float,
+        default=FILL_SPACING,
+        help="Distance (in m) between the interpolated points.",
+    )
+    fill_parser.add_argument(
+        "-o", "--output-dir", default=OUTPUT_DIR, help="Output directory."
+    )
+    fill_parser.set_defaults(func=fill)
+
+    simplify_parser = subparsers.add_parser(
+        "simplify",
+        parents=[thresholds],
+        help="Write simplified copies of GPX files, the points around holes are kept.",
+    )
+    simplify_parser.add_argument("paths", nargs="+", help="GPX files or directories.")
+    simplify_parser.add_argument(
+        "--method",
+        choices=SIMPLIFY_METHODS,
+        default="rdp",
+        help="Ramer-Douglas-Peucker with --tolerance or every --stride-th point "
+        "(default: rdp).",
+    )
+    simplify_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=SIMPLIFY_TOLERANCE,
+        help="Largest distance (in m) of a dropped point to the simplified track.",
+    )
+    simplify_parser.add_argument(
+        "--stride", type=int, default=5, help="Keep every n-th point (stride method)."
+    )
+    simplify_parser.add_argument(
+        "--thin-extensions",
+        action="store_true",
+        help="Also drop points with extensions (heart rate, cadence, ...), by "
+        "default they are all kept.",
+    )
+    simplify_parser.add_argument(
+        "-o", "--output-dir", default=OUTPUT_DIR, help="Output directory."
+    )
+    simplify_parser.set_defaults(func=simplify)
+
+    convert_parser = subparsers.add_parser(
+        "convert",
+        help="Convert GPX files into binary tracks (.gpxb), which all subcommands "
+        "read without parsing XML, or back into GPX.",
+    )
+    convert_parser.add_argument("paths", nargs="+", help="Files or directories.")
+    convert_parser.add_argument(
+        "--to-gpx",
+        action="store_true",
+        help="Convert binary tracks back into GPX files.",
+    )
+    convert_parser.add_argument(
+        "-o",
+        "--output-dir",
+        help="Output directory (default: next to every input file).",
+    )
+    convert_parser.set_defaults(func=convert)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report_path = args.profile or os.environ.get(PROFILE_ENV)
+    stats_path = args.profile_stats or os.environ.get(PROFILE_STATS_ENV)
+    if report_path or stats_path:
+        from gpxfix.profiling import profiled
+
+        if getattr(args, "jobs", 1) != 1:
+            print(
+                "Warning: profiling only records this process, the worker processes "
+                "of --jobs are missing (use --jobs 1).",
+                file=sys.stderr,
+            )
+        with profiled(report_path, stats_path):
+            return run(args)
+    return run(args)
+
+
+def run(args):
+    if args.command is None:
+        from gpxfix.main import launch
+
+        launch()
+        return 0
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Default settings of gpxfix. Kept free of heavy imports, so the command line interface
+and the GUI can build their options and windows before numpy is loaded.
+"""
+
+import os
+
+# By default, a gap means no tracking point for at least 5 sec and 400m of distance.
+TIME_THRESHOLD = 5
+DIST_THRESHOLD = 400
+# Assumed speed (m/s) for snippets at the start or the end of a track (15 km/h)
+DEFAULT_SPEED = 4.16666
+# Distance (m) between the points that fill_holes interpolates
+FILL_SPACING = 10
+OUTPUT_DIR = os.path.join(os.path.expanduser("~"), "gpxfix")
+# Suffix of binary tracks (see gpxfix.binary)
+BINARY_SUFFIX = ".gpxb"
+# Simplification methods and the default RDP tolerance in m (see gpxfix.simplify)
+SIMPLIFY_METHODS = ("rdp", "stride")
+SIMPLIFY_TOLERANCE = 5
+# Speed profiles of the snippet retiming (see gpxfix.retime)
+PROFILES = ("distance", "constant", "neighbours")
+# Activity statistics (see gpxfix.stats): minimal speed (m/s) of moving steps,
+# hysteresis (m) of the elevation gain, lower bounds (bpm) of the heart rate zones
+# 2, 3, ... and the reported speed percentiles
+MOVING_SPEED = 1.0
+ELEVATION_HYSTERESIS = 5
+HR_ZONES = (120, 140, 160, 175)
+SPEED_PERCENTILES = (10, 50, 90, 95)
+# Outlier removal (see gpxfix.clean): speed (m/s, 250 km/h) and acceleration (m/s^2)
+# gates of the spikes, window (points) and minimal distance (m) of the rolling median,
+# largest elevation jump (m) and the GPS noise (m) and motion (m/s^2) of the Kalman
+# smoother
+SPIKE_SPEED = 70
+SPIKE_ACCELERATION = 15
+MEDIAN_WINDOW = 5
+MEDIAN_DISTANCE = 200
+MEDIAN_FACTOR = 3
+ELEVATION_SPIKE = 50
+KALMAN_NOISE = 5
+KALMAN_ACCELERATION = 1
+# On-disk cache of analysed files (see gpxfix.cache) and its size limit in bytes
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "gpxfix",
+)
+CACHE_SIZE = 256 * 2**20
+# Environment variables enabling the instrumentation (see gpxfix.profiling)
+PROFILE_ENV = "GPXFIX_PROFILE"
+PROFILE_STATS_ENV = "GPXFIX_PROFILE_STATS"
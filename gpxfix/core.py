@@ -0,0 +1,418 @@
+"""
+UI-free engine of gpxfix. The GUI (gpxfix.main) and the command line interface
+(gpxfix.cli) are thin shells over these functions:
+
+    track = load("ride.gpx")
+    holes = detect_holes(track)
+    track, info = merge_snippet(track, load("snippet.gpx"), distance=1150)
+    write(track, "ride_repaired.gpx")
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from gpxfix.constants import (
+    DEFAULT_SPEED,
+    DIST_THRESHOLD,
+    FILL_SPACING,
+    OUTPUT_DIR,
+    SIMPLIFY_TOLERANCE,
+    TIME_THRESHOLD,
+)
+from gpxfix.binary import is_binary, read_track, write_track
+from gpxfix.clean import clean_track
+from gpxfix.dedup import dedup_track
+from gpxfix.geo import consecutive, find_holes, haversine, interpolate
+from gpxfix.matching import match_snippets
+from gpxfix.parser import read_gpx
+from gpxfix.profiling import count, stage
+from gpxfix.retime import retime
+from gpxfix.simplify import simplify
+from gpxfix.track import Track
+from gpxfix.writer import write_gpx
+
+Holes = namedtuple("Holes", ["indices", "sizes"])
+
+
+def load(source, dedup=True, progress=None, clean=False, kalman=False):
+    """
+    Reads a GPX file (path or binary file object) or a binary track (path ending in
+    .gpxb, see gpxfix.binary) into a gpxfix.track.Track. By default, consecutive
+    duplicate points are removed. With clean, GPS spikes and outliers are removed too
+    and with kalman, the positions are smoothed (see gpxfix.clean). progress is passed
+    on to gpxfix.parser.read_gpx.
+    """
+    if isinstance(source, (str, os.PathLike)) and is_binary(source):
+        track = read_track(source)
+    else:
+        track = read_gpx(source, progress=progress)
+    if dedup:
+        track, _ = dedup_track(track)
+    if clean or kalman:
+        track, _ = clean_track(track, gating=clean, median=clean, kalman=kalman)
+    return track
+
+
+def detect_holes(track, time_threshold=TIME_THRESHOLD, dist_threshold=DIST_THRESHOLD):
+    """
+    Detects the tracking mistakes of a track. Returns the indices of the points after
+    the holes and the hole sizes in meters.
+    """
+    with stage("holes"):
+        indices, sizes = find_holes(track, time_threshold, dist_threshold)
+    count("holes found", len(indices))
+    return Holes(indices.tolist(), sizes.tolist())
+
+
+def update_holes(
+    track,
+    holes,
+    position,
+    n_new,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+):
+    """
+    Holes of a track into which n_new points were spliced at position (see
+    merge_snippet), derived from the holes before the splice. Holes behind the
+    insertion are shifted, only the inserted points and the two seams are checked.
+    For several insertions (see fill_holes), position and n_new are sequences.
+    """
+    positions = np.atleast_1d(np.asarray(position, dtype=np.int64))
+    counts = np.atleast_1d(np.asarray(n_new, dtype=np.int64))
+    shifts = np.concatenate(([0], np.cumsum(counts)))
+    indices = np.asarray(holes.indices, dtype=np.int64)
+    sizes = np.asarray(holes.sizes, dtype=np.float64)
+    # Holes at the insertion positions are checked again with the seams
+    untouched = ~np.isin(indices, positions)
+    indices = indices[untouched]
+    indices = indices + shifts[np.searchsorted(positions, indices, "left")]
+    parts = [(indices, sizes[untouched])]
+    for start, n in zip((positions + shifts[:-1]).tolist(), counts.tolist()):
+        parts.append(
+            find_holes(track, time_threshold, dist_threshold, start, start + n + 1)
+        )
+    indices, sizes = map(np.concatenate, zip(*parts))
+    order = np.argsort(indices, kind="stable")
+    return Holes(indices[order].tolist(), sizes[order].tolist())
+
+
+def update_bounds(bounds, track, start, stop):
+    """Bounds (see Track.bounds) extended by the points start:stop of the track."""
+    if stop <= start:
+        return dict(bounds)
+    new = track.bounds(start, stop)
+    return {
+        key: (np.fmin if key.startswith("min") else np.fmax)(bounds[key], value)
+        for key, value in new.items()
+    }
+
+
+def safe_name(name):
+    """Name of a track usable as file name."""
+    return name.strip().replace(" ", "_").replace("/", "_").replace("\\", "_").lower()
+
+
+def repaired_path(
+    track, output_dir=OUTPUT_DIR, suffix="_repaired.gpx", source=None, taken=None
+):
+    """
+    Output path of a repaired track, named after the source file (if given), else
+    after the track ("track" if it has none). With taken (a set of the paths written
+    in this run, updated), a path is never handed out twice: a counter is appended.
+    """
+    stem = ""
+    if source is not None:
+        stem = os.path.splitext(os.path.basename(source))[0]
+    name = safe_name(stem or track.name) or "track"
+    path = os.path.join(output_dir, name + suffix)
+    if taken is not None:
+        number = 1
+        while path in taken:
+            number += 1
+            path = os.path.join(output_dir, f"{name}_{number}{suffix}")
+        taken.add(path)
+    return path
+
+
+def find_matches(
+    track,
+    snippets,
+    holes=None,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+):
+    """
+    Finds the hole (or the start/end) of the track every snippet belongs to, see
+    gpxfix.matching. Returns a list of gpxfix.matching.Match sorted by position.
+    """
+    if holes is None:
+        holes = detect_holes(track, time_threshold, dist_threshold).indices
+    with stage("match"):
+        return match_snippets(track, snippets, holes, dist_threshold)
+
+
+def merge_snippet(
+    track,
+    snippet,
+    distance=None,
+    holes=None,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+    position=None,
+    profile="distance",
+    speed=DEFAULT_SPEED,
+):
+    """
+    Merges a snippet into the track. The snippet is inserted into the hole it fits
+    to (or before the start/after the end of the track), unless the insertion
+    position is given. The timestamps of the snippet are derived from distance, the
+    length of the snippet according to GoogleMaps (defaults to the length of the
+    snippet itself), with the given speed profile (see gpxfix.retime; speed is used
+    by the constant profile and at the start/end of the track).
+
+    Returns the repaired track and a dict with information about the insertion (the
+    snippet points are at info["position"]:info["position"] + info["count"]).
+    Raises a ValueError if the snippet does not match the track.
+    """
+    if position is None:
+        matches = find_matches(track, [snippet], holes, time_threshold, dist_threshold)
+        if not matches:
+            raise ValueError(
+                "This GPX snippet does not match to file you try to repair."
+            )
+        position = matches[0].position
+
+    with stage("merge"):
+        inserted, info = snippet_points(
+            track, snippet, position, distance, profile, speed
+        )
+        repaired = track.splice(position, inserted)
+    count("points inserted", info["count"])
+    repaired.name = safe_name(track.name)
+    return repaired, info
+
+
+def snippet_points(track, snippet, position, distance, profile, speed):
+    """
+    Points of a snippet to be inserted before point position of the track (retimed,
+    see merge_snippet) and the dict with information about the insertion.
+    """
+    if distance is not None and distance <= 0:
+        raise ValueError("Please insert a valid distance in m.")
+    info = {"position": position}
+
+    # Compute cumulative (pointwise) distance of GPX snippet
+    cumDist = consecutive(snippet.lat, snippet.lon).sum()
+    if position != len(track) and position != 0:  # Regular case
+        # Compute cumulative (pointwise) distance of GPX track (starting from the
+        # last point before the hole) and compare to GoogleMaps
+        cumDist = consecutive(
+            np.concatenate(([track.lat[position - 1]], snippet.lat)),
+            np.concatenate(([track.lon[position - 1]], snippet.lon)),
+        ).sum()
+        if distance is None:
+            distance = cumDist
+
+        info.update(
+            distance=distance,
+            cumulative_distance=cumDist,
+            error=(cumDist / distance) - 1,
+        )
+
+    else:  # Special case that we insert sth at beginning or end
+        if distance is None:
+            distance = cumDist
+        info.update(distance=distance)
+
+    # Only the snippet points are created, the original track is spliced (its
+    # points before and after the insertion position are taken over untouched).
+    keep, times, info["speed"] = retime(
+        track, snippet, position, distance, profile, speed
+    )
+
+    # The extensions of the snippet points (heart rate, cadence, power, ...) are
+    # taken over verbatim.
+    inserted = snippet.select(keep)
+    inserted.time = np.asarray(times, dtype=np.int64)
+    info["count"] = len(inserted)
+    return inserted, info
+
+
+def merge_snippets(
+    track,
+    snippets,
+    distances=None,
+    holes=None,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+    profile="distance",
+    speed=DEFAULT_SPEED,
+    fill=False,
+    spacing=FILL_SPACING,
+):
+    """
+    Merges several snippets into the track in one pass. All snippets are matched
+    against the holes of the original track at once (see find_matches) and retimed
+    against the original points (see merge_snippet), then all of them are spliced in
+    with a single Track.insert. With fill, the holes no snippet matched are filled
+    by interpolation (see fill_holes) in the same pass. The cost is linear in the
+    length of the track plus the snippets, not in their product.
+
+    Returns the repaired track and a dict with the insertion positions (in the
+    original track) and counts like fill_holes, the information about every merged
+    snippet (see merge_snippet, "snippet" is its index), the filled holes and the
+    indices of the snippets that matched nowhere.
+    """
+    snippets = list(snippets)
+    if distances is not None and len(distances) != len(snippets):
+        raise ValueError("Please pass one distance per snippet.")
+    if holes is None:
+        holes = detect_holes(track, time_threshold, dist_threshold).indices
+    matches = find_matches(track, snippets, holes, time_threshold, dist_threshold)
+
+    with stage("merge"):
+        blocks, merged = [], []
+        for match in matches:
+            distance = None if distances is None else distances[match.snippet]
+            inserted, info = snippet_points(
+                track, snippets[match.snippet], match.position, distance, profile, speed
+            )
+            info["snippet"] = match.snippet
+            blocks.append((match.position, inserted))
+            merged.append(info)
+
+        filled = []
+        if fill:
+            used = {match.position for match in matches}
+            filled = [hole for hole in holes if hole not in used]
+            points, counts = fill_points(track, filled, spacing)
+            bounds = np.concatenate(([0], np.cumsum(counts))).tolist()
+            blocks += [
+                (hole, points.select(slice(bounds[j], bounds[j + 1])))
+                for j, hole in enumerate(filled)
+            ]
+
+        blocks.sort(key=lambda block: block[0])
+        positions = [position for position, _ in blocks]
+        counts = [len(inserted) for _, inserted in blocks]
+        inserted = Track.concatenate(
+            [inserted for _, inserted in blocks], track.namespaces
+        )
+        repaired = track.insert(positions, inserted, counts)
+    count("points inserted", len(inserted))
+    repaired.name = safe_name(track.name)
+    matched = {match.snippet for match in matches}
+    return repaired, {
+        "positions": positions,
+        "counts": counts,
+        "snippets": merged,
+        "filled": filled,
+        "unmatched": [j for j in range(len(snippets)) if j not in matched],
+    }
+
+
+def fill_holes(
+    track,
+    holes=None,
+    spacing=FILL_SPACING,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+):
+    """
+    Fills all holes of the track at once, without snippets: the points are placed on
+    the great circle between the points before and after every hole, spacing meters
+    apart. Timestamps are spread evenly over the time gap of the hole and elevations
+    are interpolated linearly.
+
+    Returns the repaired track and a dict with the insertion positions and counts
+    (the points filled into hole j are at positions[j] + sum(counts[:j]) onwards).
+    """
+    if holes is None:
+        holes = detect_holes(track, time_threshold, dist_threshold).indices
+    with stage("merge"):
+        points, counts = fill_points(track, holes, spacing)
+        repaired = track.insert(holes, points, counts)
+    count("points inserted", len(points))
+    repaired.name = safe_name(track.name)
+    positions = np.asarray(holes, dtype=np.int64).tolist()
+    return repaired, {"positions": positions, "counts": counts.tolist()}
+
+
+def fill_points(track, holes, spacing=FILL_SPACING):
+    """
+    Interpolated points of the given holes (see fill_holes), as one track, and the
+    number of points of every hole.
+    """
+    if spacing <= 0:
+        raise ValueError("The spacing has to be positive.")
+    after = np.asarray(holes, dtype=np.int64)
+    before = after - 1
+    size = haversine(
+        track.lat[before], track.lon[before], track.lat[after], track.lon[after]
+    )
+    counts = np.maximum(np.ceil(size / spacing).astype(np.int64) - 1, 0)
+
+    # Step r = 1..counts[j] of every hole j, as fraction of the hole
+    hole = np.repeat(np.arange(len(after)), counts)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    parts = counts[hole] + 1
+    fractions = steps / parts
+    b, a = before[hole], after[hole]
+    lat, lon = interpolate(
+        track.lat[b], track.lon[b], track.lat[a], track.lon[a], fractions
+    )
+    ele = track.ele[b] + fractions * (track.ele[a] - track.ele[b])
+    # Integer arithmetic keeps the timestamps exact and strictly inside the gap
+    time = track.time[b] + (track.time[a] - track.time[b]) * steps // parts
+
+    return Track(lat, lon, ele, time), counts
+
+
+def simplify_track(
+    track,
+    method="rdp",
+    tolerance=SIMPLIFY_TOLERANCE,
+    stride=5,
+    holes=None,
+    keep_extensions=True,
+    time_threshold=TIME_THRESHOLD,
+    dist_threshold=DIST_THRESHOLD,
+):
+    """
+    Simplifies the track for a preview or for sharing, see gpxfix.simplify. The
+    points around the holes are kept, and RDP leaves at most dist_threshold meters
+    (straight line) between kept points, so simplifying opens no new holes.
+
+    Returns the simplified track and a dict with the indices of the kept points.
+    """
+    if holes is None:
+        holes = detect_holes(track, time_threshold, dist_threshold).indices
+    with stage("simplify"):
+        simplified, indices = simplify(
+            track,
+            method,
+            tolerance=tolerance,
+            stride=stride,
+            holes=holes,
+            keep_extensions=keep_extensions,
+            max_length=dist_threshold,
+        )
+    return simplified, {"indices": indices.tolist()}
+
+
+def write(track, path, progress=None):
+    """
+    Writes the track as GPX file, or as binary track if path ends in .gpxb (missing
+    directories are created). The file is replaced atomically, see gpxfix.writer
+    (also for progress).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if is_binary(path):
+        write_track(track, path)
+    else:
+        write_gpx(track, path, progress=progress)
@@ -0,0 +1,39 @@
+"""
+Removal of duplicate trackpoints, i.e., consecutive points with the SAME coordinates.
+This happens e.g., if a device continues/starts tracking without having GPS signal.
+"""
+
+import numpy as np
+
+from gpxfix.profiling import count, stage
+
+
+def keep_mask(lat, lon):
+    """
+    Build the keep-mask for a sequence of coordinates in one shot. A point is dropped
+    if it has the same latitude and longitude as its predecessor. Since runs of
+    duplicates all share the coordinates of the first point of the run, comparing with
+    the direct predecessor is equivalent to comparing with the last kept point.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    keep = np.ones(len(lat), dtype=bool)
+    if len(lat) > 1:
+        np.logical_or(lat[1:] != lat[:-1], lon[1:] != lon[:-1], out=keep[1:])
+    return keep
+
+
+def dedup_track(track):
+    """
+    Removes duplicates from a gpxfix.track.Track (the first point of every segment is
+    always kept). Returns the deduplicated track and the per-segment removal counts.
+    """
+    with stage("dedup"):
+        keep = keep_mask(track.lat, track.lon)
+        keep[track.segment_starts()] = True
+        removed = np.concatenate(([0], np.cumsum(~keep)))
+        counts = (removed[track.offsets[1:]] - removed[track.offsets[:-1]]).tolist()
+        count("duplicates removed", sum(counts))
+        if not sum(counts):
+            return track, counts
+        return track.select(keep), counts
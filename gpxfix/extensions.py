@@ -0,0 +1,202 @@
+"""
+Storage of the raw <extensions> payloads of the trackpoints of a track.
+
+Instead of one element tree per trackpoint, the payloads of all points live in one
+contiguous byte buffer plus an offset array: the payload of point i is
+data[offsets[i]:offsets[i + 1]] (empty if the point has no extensions). Payloads are
+the serialized children of the <extensions> element with their original namespace
+prefixes (the namespace declarations are kept once per track, see Track.namespaces).
+"""
+
+import re
+from xml.etree import ElementTree
+
+import numpy as np
+
+# Same output as xml.sax.saxutils.escape/quoteattr, which would import urllib (and
+# with it http.client) at startup.
+_ENTITIES = {"&": "&amp;", "<": "&lt;", ">": "&gt;"}
+_ATTR_ENTITIES = {**_ENTITIES, "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+
+def escape(text, entities=_ENTITIES):
+    """Escapes &, < and > (and the characters in entities) in a string."""
+    for char, entity in entities.items():
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+
+def quoteattr(value):
+    """Escapes and quotes an attribute value (like xml.sax.saxutils.quoteattr)."""
+    value = escape(value, _ATTR_ENTITIES)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"{}"'.format(value.replace('"', "&quot;"))
+
+
+def qualified_name(tag, prefixes):
+    # "{uri}name" -> "prefix:name"
+    if tag[0] != "{":
+        return tag
+    uri, name = tag[1:].split("}", 1)
+    prefix = prefixes.get(uri)
+    return f"{prefix}:{name}" if prefix else name
+
+
+def _serialize(elem, prefixes):
+    tag = qualified_name(elem.tag, prefixes)
+    attrs = "".join(
+        f" {qualified_name(k, prefixes)}={quoteattr(v)}" for k, v in elem.attrib.items()
+    )
+    text = escape(elem.text.strip()) if elem.text else ""
+    children = "".join(_serialize(child, prefixes) for child in elem)
+    if not text and not children:
+        return f"<{tag}{attrs}/>"
+    return f"<{tag}{attrs}>{text}{children}</{tag}>"
+
+
+def serialize(elements, prefixes):
+    """
+    Compact payload of a sequence of extension elements (e.g., the children of an
+    <extensions> element), written with the prefixes given as uri -> prefix.
+    """
+    return "".join(_serialize(elem, prefixes) for elem in elements).encode("utf-8")
+
+
+# Start and end tags (text content and attribute values are between or inside them)
+_TAG = re.compile(rb"<[^<>]*>")
+
+
+def _prefix_pattern(prefixes):
+    # Prefix of the tag name (at the start of a tag) or of an attribute name (followed
+    # by "="), applied to the tags only, so text content is never rewritten
+    names = b"|".join(re.escape(p.encode("utf-8")) for p in prefixes)
+    return re.compile(
+        rb"(^</?)(" + names + rb"):(?=[\w.-]+[\s/>])"
+        rb"|(\s)(" + names + rb"):(?=[\w.-]+\s*=)"
+    )
+
+
+def merge_namespaces(namespaces, other, extensions):
+    """
+    Combines the namespace maps (prefix -> uri) of two tracks for payloads that are
+    copied verbatim from other into the first track. Returns the combined map and the
+    extensions of other, whose prefixes are only rewritten if they clash (same prefix
+    for a different uri or same uri under a different prefix).
+    """
+    merged = dict(namespaces)
+    prefixes = {uri: prefix for prefix, uri in namespaces.items()}
+    renames = {}
+    for prefix, uri in other.items():
+        if uri in prefixes:
+            target = prefixes[uri]
+        elif prefix in merged:
+            target = next(
+                f"ns{k}" for k in range(len(merged) + 1) if f"ns{k}" not in merged
+            )
+        else:
+            target = prefix
+        merged[target] = uri
+        prefixes[uri] = target
+        if target != prefix:
+            renames[prefix] = target
+    if renames:
+        extensions = extensions.rename_prefixes(renames)
+    return merged, extensions
+
+
+class Extensions:
+    def __init__(self, data=None, offsets=None):
+        self.data = np.frombuffer(b"", dtype=np.uint8) if data is None else data
+        self.data = np.asarray(self.data, dtype=np.uint8)
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.offsets = np.ascontiguousarray(self.offsets, dtype=np.int64)
+
+    @classmethod
+    def empty(cls, n):
+        """Extensions of n points without payload."""
+        return cls(offsets=np.zeros(n + 1, dtype=np.int64))
+
+    @classmethod
+    def from_payloads(cls, payloads):
+        """Builds the store from a sequence of bytes (or None) payloads."""
+        payloads = [p or b"" for p in payloads]
+        offsets = np.zeros(len(payloads) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in payloads], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(payloads), dtype=np.uint8), offsets)
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = list(parts)
+        if not parts:
+            return cls()
+        # Shift the offsets of every part behind the payloads of its predecessors
+        offsets, shift = [np.zeros(1, dtype=np.int64)], 0
+        for part in parts:
+            offsets.append(part.offsets[1:] + (shift - part.offsets[0]))
+            shift += int(part.offsets[-1] - part.offsets[0])
+        offsets = np.concatenate(offsets)
+        data = np.concatenate([p.data[p.offsets[0] : p.offsets[-1]] for p in parts])
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, ind):
+        """Payload of point ind as bytes (the points of a slice as Extensions)."""
+        if isinstance(ind, slice):
+            return self.slice(ind.start, ind.stop)
+        ind = range(len(self))[ind]
+        return self.data[self.offsets[ind] : self.offsets[ind + 1]].tobytes()
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def take(self, indices):
+        """
+        Payloads of the points at the given indices (or boolean mask), gathered in one
+        vectorized pass over the byte buffer.
+        """
+        indices = np.arange(len(self))[indices]
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return Extensions(self.data[gather], offsets)
+
+    def slice(self, start, stop):
+        """Contiguous range of points (no gather needed)."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        offsets = self.offsets[start : max(start, stop) + 1]
+        return Extensions(self.data[offsets[0] : offsets[-1]], offsets - offsets[0])
+
+    def rename_prefixes(self, renames):
+        """Payloads with the namespace prefixes replaced as given (old -> new)."""
+        if not renames or not len(self.data):
+            return self
+        pattern = _prefix_pattern(renames)
+        encoded = {k.encode("utf-8"): v.encode("utf-8") for k, v in renames.items()}
+
+        def rename(match):
+            before, prefix = match.group(1, 2) if match.group(1) else match.group(3, 4)
+            return before + encoded[prefix] + b":"
+
+        def rename_tag(match):
+            return pattern.sub(rename, match.group())
+
+        return Extensions.from_payloads(
+            [_TAG.sub(rename_tag, self[ind]) for ind in range(len(self))]
+        )
+
+    def elements(self, ind, namespaces):
+        """Parses the payload of point ind into a list of ElementTree elements."""
+        payload = self[ind]
+        if not payload:
+            return []
+        declarations = "".join(f' xmlns:{p}="{uri}"' for p, uri in namespaces.items())
+        wrapper = f"<extensions{declarations}>".encode("utf-8")
+        return list(ElementTree.fromstring(wrapper + payload + b"</extensions>"))
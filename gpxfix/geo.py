@@ -0,0 +1,121 @@
+"""
+Batched haversine kernels working on whole coordinate arrays.
+
+The formula and earth radius are the ones of gpxpy.geo.haversine_distance, so results
+match gpxpy to within floating point noise (relative deviation below 1e-9, see
+benchmarks/bench_haversine.py).
+"""
+
+import numpy as np
+
+# Same radius as gpxpy.geo.EARTH_RADIUS (in meters)
+EARTH_RADIUS = 6378.137 * 1000
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance (in meters) between two (broadcastable) sets of coordinates
+    given in degrees.
+    """
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat1 - lat2) / 2) ** 2 + np.sin((lon1 - lon2) / 2) ** 2 * np.cos(
+        lat1
+    ) * np.cos(lat2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def consecutive(lat, lon):
+    """
+    Distance of every point to its predecessor. The result has the same length as the
+    input and is 0 for the first point.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    dist = np.zeros(len(lat), dtype=np.float64)
+    if len(lat) > 1:
+        dist[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    return dist
+
+
+def one_to_many(lat, lon, lats, lons):
+    """Distance of a single coordinate to every coordinate in lats/lons."""
+    return haversine(lat, lon, np.asarray(lats), np.asarray(lons))
+
+
+def many_to_many(lats1, lons1, lats2, lons2):
+    """Distance matrix of shape (len(lats1), len(lats2))."""
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, None]
+    lons1 = np.asarray(lons1, dtype=np.float64)[:, None]
+    return haversine(lats1, lons1, np.asarray(lats2), np.asarray(lons2))
+
+
+def to_cartesian(lat, lon):
+    """
+    Points on the sphere (x, y, z in meters, shape (n, 3)). Straight-line distances of
+    these points never exceed the great-circle distances.
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return EARTH_RADIUS * np.stack(
+        (cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)), axis=-1
+    )
+
+
+def interpolate(lat1, lon1, lat2, lon2, fractions):
+    """
+    Points at the given fractions (0 = first, 1 = second coordinate) of the great
+    circle between two (broadcastable) sets of coordinates, in degrees.
+    """
+    start, end = to_cartesian(lat1, lon1), to_cartesian(lat2, lon2)
+    fractions = np.asarray(fractions, dtype=np.float64)[..., None]
+    cos = np.clip((start * end).sum(axis=-1, keepdims=True) / EARTH_RADIUS**2, -1, 1)
+    angle = np.arccos(cos)
+    sin = np.sin(angle)
+    # Spherical linear interpolation, linear for (almost) identical points
+    small = sin < 1e-12
+    safe = np.where(small, 1.0, sin)
+    weight1 = np.where(small, 1 - fractions, np.sin((1 - fractions) * angle) / safe)
+    weight2 = np.where(small, fractions, np.sin(fractions * angle) / safe)
+    x, y, z = np.moveaxis(weight1 * start + weight2 * end, -1, 0)
+    return (
+        np.degrees(np.arctan2(z, np.hypot(x, y))),
+        np.degrees(np.arctan2(y, x)),
+    )
+
+
+def headings(lat1, lon1, lat2, lon2):
+    """
+    Unit vectors (east, north) pointing from the first to the second coordinates, in a
+    local flat approximation. Zero vectors where the coordinates coincide.
+    """
+    east = np.radians((lon2 - lon1 + 180) % 360 - 180) * np.cos(
+        np.radians((lat1 + lat2) / 2)
+    )
+    north = np.radians(lat2 - lat1)
+    vectors = np.stack((east, north), axis=-1)
+    norm = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norm, out=np.zeros_like(vectors), where=norm > 0)
+
+
+def find_holes(track, time_threshold, dist_threshold, start=0, stop=None):
+    """
+    Detects the tracking mistakes ("holes") of a gpxfix.track.Track: points that are
+    more than time_threshold seconds AND more than dist_threshold meters away from
+    their predecessor. Returns the indices of the points after the holes and the
+    size of the holes (in meters). With start/stop, only the points start:stop are
+    checked (against their predecessors), e.g., around the seams of a splice.
+
+    All segments are checked in one pass, including the gaps between consecutive
+    segments of a track (devices often start a new segment after a pause). The
+    first points of the tracks are never holes.
+    """
+    start, stop, _ = slice(start, stop).indices(len(track))
+    # Include the predecessor of start, its own difference is never a hole
+    first = max(start - 1, 0)
+    dist = consecutive(track.lat[first:stop], track.lon[first:stop])
+    holes = np.flatnonzero(
+        (track.time_diff(first, stop, across_segments=True) > time_threshold)
+        & (dist > dist_threshold)
+    )
+    return holes + first, dist[holes]
@@ -1,11 +1,12 @@
 # Import modules
-import datetime
 import os
 import webbrowser
-from math import asin, cos, radians, sin, sqrt
 from tkinter import (
+    BooleanVar,
     Button,
+    Checkbutton,
     Frame,
+    Label,
     OptionMenu,
     StringVar,
     Tk,
@@ -14,14 +15,19 @@ from tkinter import (
     messagebox,
 )
 
-import gpxpy
-import gpxpy.gpx
-from xml.etree import ElementTree
-import matplotlib.pyplot as plt
-import numpy as np
+from gpxfix.constants import (
+    DIST_THRESHOLD,
+    FILL_SPACING,
+    SIMPLIFY_TOLERANCE,
+    TIME_THRESHOLD,
+)
+from gpxfix.worker import Worker
+
+# The engine (numpy, parser, ...) is imported when first needed, so the window shows
+# up without waiting for it.
 
-EXTENSION_PREFIX = f"""<gpxtpx:TrackPointExtension xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">"""
-EXTENSION_POSTFIX = "</gpxtpx:TrackPointExtension>"
+# Interval (ms) in which the main loop checks on the background operations
+POLL_INTERVAL = 50
 
 
 class Window:
@@ -30,10 +36,16 @@ class Window:
         """Hyperparameters"""
         # How large need the gap to be to be considered as an error ("tracking hole") in your GPX file?
         # By default, a gap means no tracking point for at least 5 sec and 400m of distance.
-        self.timeThreshold = 5
-        self.distThreshold = 400
-        # Resolution of the track when displayed on map. 1 is best resolution, but incredibly slow.
-        self.resolution = 5
+        self.timeThreshold = TIME_THRESHOLD
+        self.distThreshold = DIST_THRESHOLD
+        # Resolution (m) of the simplified track (see gpxfix.simplify) that is displayed and exported.
+        # 1 is best resolution, but many more points.
+        self.resolution = SIMPLIFY_TOLERANCE
+        # Distance (m) between the points that are interpolated by "Fill all holes"
+        self.fillSpacing = FILL_SPACING
+        # Remove GPS spikes and outliers (see gpxfix.clean) from the uploaded track
+        # before the holes are detected. Off by default, set by the checkbox.
+        self.cleanSpikes = BooleanVar(master, value=False)
 
         """  Define class variables   """
         self.gpx = dict()
@@ -83,6 +95,24 @@ class Window:
         )
         self.b_trackMist.pack(side="left")
 
+        # In-app preview of the track and export of a simplified copy (e.g. for sharing)
+        self.b_preview = Button(
+            self.track_controls, text="Preview", command=self.showPreview
+        )
+        self.b_preview.pack(side="left", padx=(12, 0))
+
+        self.b_simplify = Button(
+            self.track_controls,
+            text="Export simplified",
+            command=self.ExportSimplified,
+        )
+        self.b_simplify.pack(side="left", padx=(12, 0))
+
+        self.c_clean = Checkbutton(
+            self.track_controls, text="Remove GPS spikes", variable=self.cleanSpikes
+        )
+        self.c_clean.pack(side="left", padx=(12, 0))
+
         # Snippet controls row
         self.snip_controls = Frame(self.main)
         self.snip_controls.pack(pady=(6, 10))
@@ -96,6 +126,15 @@ class Window:
         )
         self.b_gpxUpSnipp.pack(side="left", padx=(0, 12))
 
+        # Several snippets, inserted into the holes they match in one pass
+        self.b_gpxUpSnippets = Button(
+            self.snip_controls,
+            text="Upload several fragments",
+            bg="yellow",
+            command=self.snippetsUpload,
+        )
+        self.b_gpxUpSnippets.pack(side="left", padx=(0, 12))
+
         # Confirmation button for distance submission (opens a modal prompt).
         self.b_OK = Button(
             self.snip_controls, text="Enter Distance", command=self.read_distance
@@ -110,28 +149,159 @@ class Window:
         )
         self.b_merge.pack()
 
+        # Status row: progress of the background operation and its cancel button.
+        # Parsing, repairing and writing run on a worker thread (see gpxfix.worker),
+        # so the window stays responsive.
+        self.status_controls = Frame(self.main)
+        self.status_controls.pack(side="bottom", fill="x", pady=(12, 0))
+        self.status = Label(self.status_controls, text="", anchor="w")
+        self.status.pack(side="left", fill="x", expand=True)
+        self.b_cancel = Button(
+            self.status_controls,
+            text="Cancel",
+            state="disabled",
+            command=self.cancelWork,
+        )
+        self.b_cancel.pack(side="right")
+        self.worker = Worker()
+        self.master.after(POLL_INTERVAL, self.pollWorker)
+
+    def runInBackground(self, description, function, on_done):
+        """
+        Runs function(job) on the worker thread and on_done with its result in the main
+        loop (see pollWorker). Only one operation runs at a time.
+        """
+        if self.worker.busy:
+            self.messageWindow(
+                title="Please wait",
+                message="Please wait until the current operation is finished or cancel it.",
+                width=250,
+                height=100,
+            )
+            return None
+        self.worker.submit(
+            description, function, on_done=on_done, on_error=self.showError
+        )
+        self.status.configure(text=f"{description} ...")
+        self.b_cancel.configure(state="normal")
+        return None
+
+    def pollWorker(self):
+        # Runs the callbacks of the finished operations and shows the progress. The
+        # next poll is scheduled in any case, otherwise the GUI would stay busy.
+        # Messages the callbacks put into the status bar are kept.
+        try:
+            for job, state, value in self.worker.poll():
+                if state == "failed":
+                    self.showError(value)
+                if state == "cancelled":
+                    self.status.configure(text=f"{job.description} cancelled.")
+                elif self.status.cget("text").startswith(job.description):
+                    self.status.configure(text="")
+            job = self.worker.current
+            if job is not None:
+                fraction = "" if job.fraction is None else f" {job.fraction:.0%}"
+                self.status.configure(text=f"{job.description}{fraction} ...")
+            if not self.worker.busy:
+                self.b_cancel.configure(state="disabled")
+        finally:
+            self.master.after(POLL_INTERVAL, self.pollWorker)
+
+    def cancelWork(self):
+        self.worker.cancel()
+
+    def showError(self, error):
+        title = "Data Error" if isinstance(error, ValueError) else "Error"
+        self.messageWindow(title, str(error), 200, 100)
+
     def trackUpload(self, fileType):
         """
         Function that receives the name of the file that is uploaded (main oder snip)
         It opens fileDialog to read in gpx, parses the file, calls the extraction method
         and displays a confirmation window
         """
+        from gpxfix.cache import cached_analyse, evict
+        from gpxfix.stats import summary, track_stats
+
+        # FileDialog, parsing and parameter extraction. Files that were analysed
+        # before (with the same thresholds) are read from the cache. Parsing (and the
+        # statistics of the main track) run in the background, the results are taken
+        # over in the main loop.
+        path = filedialog.askopenfilename(parent=self.master, title="Choose a file")
+        if not path:
+            return None
 
-        # FileDialog, parsing and parameter extraction
-        self.gpx[fileType]["path"] = filedialog.askopenfilename(
-            parent=self.master, title="Choose a file"
-        )
-        self.gpx[fileType]["raw"] = open(self.gpx[fileType]["path"], "r")
-        self.gpx[fileType]["parsed"] = gpxpy.parse(self.gpx[fileType]["raw"])
+        # Tk variables are read in the main loop only
+        clean = fileType == "main" and self.cleanSpikes.get()
 
-        self.extractParam(fileType)
+        def analyse(job):
+            analysis = cached_analyse(
+                path,
+                self.timeThreshold,
+                self.distThreshold,
+                progress=job.progress,
+                clean=clean,
+            )
+            try:
+                evict()
+            except OSError:
+                pass
+            stats = track_stats(analysis.track) if fileType == "main" else None
+            return analysis, stats
+
+        def done(result):
+            analysis, stats = result
+            # Raises for files without trackpoints, before anything is taken over
+            self.extractParam(fileType, analysis)
+            self.gpx[fileType]["path"] = path
+            self.gpx[fileType].pop("tracks", None)
 
-        self.messageWindow(
-            title="Confirmation",
-            message="Upload and parsing of GPS successful",
-            width=250,
-            height=100,
-        )
+            self.messageWindow(
+                title="Confirmation",
+                message="Upload and parsing of GPS successful"
+                + (f"\n\n{summary(stats)}" if stats else ""),
+                width=250,
+                height=100,
+            )
+
+        self.runInBackground(f"Loading {os.path.basename(path)}", analyse, done)
+        return None
+
+    def snippetsUpload(self):
+        """
+        Reads several snippets at once. Merge then inserts every snippet into the hole
+        it matches, with the length of the snippets as distances.
+        """
+        from gpxfix.core import load
+
+        paths = filedialog.askopenfilenames(parent=self.master, title="Choose files")
+        if not paths:
+            return None
+
+        def read(job):
+            tracks = []
+            for i, path in enumerate(paths):
+                tracks.append(
+                    load(
+                        path,
+                        progress=lambda f, i=i: job.progress(
+                            (i + (f or 0)) / len(paths)
+                        ),
+                    )
+                )
+            return tracks
+
+        def done(tracks):
+            self.gpx["snip"] = {"paths": list(paths), "tracks": tracks}
+            self.messageWindow(
+                title="Confirmation",
+                message=f"Upload and parsing of {len(tracks)} GPX fragments successful",
+                width=250,
+                height=100,
+            )
+
+        self.runInBackground(f"Loading {len(paths)} fragments", read, done)
+        return None
 
     def trackMistakes(self):
         """
@@ -140,7 +310,7 @@ class Window:
         """
 
         try:
-            self.gpx["main"]["plain"]
+            self.gpx["main"]["track"]
         except KeyError:
             self.messageWindow(
                 message="File Error, Please upload a valid GPX track (yellow "
@@ -158,16 +328,19 @@ class Window:
         # Collect tracking holes and links.
         self.links = []
         self.hole_summaries = []
+        track = self.gpx["main"]["track"]
+        segmentStarts = track.segment_starts()
         for run, errInd in enumerate(self.gpx["main"]["trackHoles"]):
-            startLat = str(round(self.gpx["main"]["plain"][errInd - 1, 0], 4))
-            startLong = str(round(self.gpx["main"]["plain"][errInd - 1, 1], 4))
-            endLat = str(round(self.gpx["main"]["plain"][errInd, 0], 4))
-            endLong = str(round(self.gpx["main"]["plain"][errInd, 1], 4))
+            startLat = str(round(track.lat[errInd - 1], 4))
+            startLong = str(round(track.lon[errInd - 1], 4))
+            endLat = str(round(track.lat[errInd], 4))
+            endLong = str(round(track.lon[errInd], 4))
             dist = str(round(self.gpx["main"]["trackHoleSizes"][run], 1))
 
             self.hole_summaries.append(
                 f"Hole #{run + 1}\nFrom: {startLat} , {startLong}\n"
                 f"To: {endLat} , {endLong}\nDistance: {dist} m"
+                + ("\n(between two track segments)" if segmentStarts[errInd] else "")
             )
             self.links.append(
                 self.GM_start
@@ -214,6 +387,14 @@ class Window:
         )
         details_but.pack(side="left")
 
+        # Show the selected hole in the in-app preview (no network needed).
+        preview_but = Button(
+            top_controls,
+            text="Preview",
+            command=lambda: self.showPreview(tkvar),
+        )
+        preview_but.pack(side="left", padx=(8, 0))
+
         # Bottom controls: helper actions.
         bottom_controls = Frame(self.win_links)
         bottom_controls.pack(side="bottom", pady=(10, 16))
@@ -222,9 +403,9 @@ class Window:
         missStartString = (
             self.GM_start
             + "/"
-            + str(self.gpx["main"]["plain"][0, 0])
+            + str(track.lat[0])
             + ","
-            + str(self.gpx["main"]["plain"][0, 1])
+            + str(track.lon[0])
             + self.GM_end
         )
         missStart = Button(
@@ -236,11 +417,7 @@ class Window:
         )
         missStart.pack(side="left", padx=(0, 8))
         missEndString = (
-            self.GM_start
-            + str(self.gpx["main"]["plain"][-1, 0])
-            + ","
-            + str(self.gpx["main"]["plain"][-1, 1])
-            + self.GM_end
+            self.GM_start + str(track.lat[-1]) + "," + str(track.lon[-1]) + self.GM_end
         )
         missEnd = Button(
             bottom_controls,
@@ -261,6 +438,17 @@ class Window:
         )
         mapstogpx.pack(side="left")
 
+        # Fill all holes by interpolation (no snippets needed)
+        fill_but = Button(
+            top_controls,
+            text="Fill all holes",
+            bg="green",
+            command=self.FillHoles,
+        )
+        if not self.links:
+            fill_but.configure(state="disabled")
+        fill_but.pack(side="left", padx=(8, 0))
+
         if self.links:
             messagebox.showinfo(
                 "Tracking mistakes",
@@ -285,6 +473,33 @@ class Window:
             webbrowser.open_new(self.links[index])
         return None
 
+    def showPreview(self, tkvar=None):
+        """
+        Opens the in-app preview of the main track with all holes highlighted (see
+        gpxfix.preview), centered on the hole selected in tkvar if given.
+        """
+        from gpxfix.preview import PreviewWindow
+
+        try:
+            track = self.gpx["main"]["track"]
+        except KeyError:
+            self.messageWindow(
+                message="File Error, Please upload a valid GPX track (yellow "
+                "button) before you try to preview it.",
+                width=250,
+                height=150,
+            )
+            return None
+        holes = self.gpx["main"]["trackHoles"]
+        focus = None
+        if tkvar is not None:
+            try:
+                focus = holes[int(tkvar.get()) - 1]
+            except (TypeError, ValueError, IndexError):
+                focus = None
+        PreviewWindow(self.master, track, holes, tolerance=self.resolution, focus=focus)
+        return None
+
     def show_selected_hole_info(self, tkvar):
         if not self.links:
             messagebox.showinfo(
@@ -305,92 +520,85 @@ class Window:
             )
         return None
 
-    def extractParam(self, fileType):
+    def extractParam(self, fileType, analysis=None):
         """
         Function extracting basic attributes of the GPX files as well as detecting the mistakes in tracking.
-        Objects of type gpxpy.gpx.GPXTrackPoint have attributes of type longitude, latitude, time and elevation
+        The track is a gpxfix.track.Track with columns of longitude, latitude, time and elevation
+        If the analysis of the uploaded file is passed (see gpxfix.cache), the track is not analysed again.
         """
-
-        # Save name of file
-        if fileType == "main":
-            self.filename = (
-                self.gpx["main"]["parsed"]
-                .tracks[0]
-                .name.strip()
-                .replace(" ", "_")
-                .replace("/", "_")
-                .replace("\\", "_")
-                .lower()
-            )
+        from gpxfix.clean import clean_track
+        from gpxfix.core import detect_holes
+        from gpxfix.dedup import dedup_track
 
         # NOTE: First, we remove points in the file that are duplicates (i.e.,
         # consecutive time points with SAME coordinates. This happens e.g., if
         # a device continues/starts tracking without having GPS signal
-        for track in self.gpx[fileType]["parsed"].tracks:
-            for segment in track.segments:
-
-                sane, counter = False, 0
-                while not sane:
-                    sane = True
-                    for ind, point in enumerate(segment.points):
-                        lat, long = point.latitude, point.longitude
-                        if ind > 0 and lat == prev_lat and long == prev_long:
-                            segment.remove_point(ind)
-                            sane = False
-                            counter += 1
-                            break
-                        prev_lat, prev_long = point.latitude, point.longitude
-
-        print(f"Removed {counter} duplicate points.")
-
-        # Allocate space
-        self.gpx[fileType]["plain"] = np.zeros(
-            (len(self.gpx[fileType]["parsed"].tracks[0].segments[0].points), 4)
-        )
+        if analysis is None:
+            track, duplicates = dedup_track(self.gpx[fileType]["track"])
+            cleaning = None
+            if fileType == "main" and self.cleanSpikes.get():
+                track, cleaning = clean_track(track)
+            holes = None
+        else:
+            track, duplicates, cleaning, holes = analysis
+        if not len(track):
+            raise ValueError("The file contains no trackpoints.")
+        self.gpx[fileType]["duplicates"] = duplicates
+        self.gpx[fileType]["track"] = track
+        message = f"Removed {sum(duplicates)} duplicate points"
+        # GPS spikes and outliers are removed before the holes are detected, they
+        # would be reported as holes otherwise
+        if cleaning is not None:
+            message += (
+                f", {len(cleaning['spikes']) + len(cleaning['outliers'])} GPS spikes "
+                f"and fixed {len(cleaning['elevations'])} elevations"
+            )
+        self.status.configure(text=f"{message}.")
         self.gpx[fileType]["trackHoles"] = []
         self.gpx[fileType]["trackHoleSizes"] = []
 
-        # Extract datapoints in easily accessible format (timeDiff to prev, lat, long, elev)
-        for track in self.gpx[fileType]["parsed"].tracks:
-            for segment in track.segments:
-                for ind, point in enumerate(segment.points):
-                    # For every GPX point save longitude, latitude and elevation
-                    self.gpx[fileType]["plain"][ind, 0] = point.latitude
-                    self.gpx[fileType]["plain"][ind, 1] = point.longitude
-                    self.gpx[fileType]["plain"][ind, 2] = point.elevation
-
-                    # Save timeDifference to previous step. Absolute time is still complicated to access.
-                    if ind > 0 and fileType == "main":
-                        timeDiff = (
-                            point.time - segment.points[ind - 1].time
-                        ).total_seconds()
-                        self.gpx[fileType]["plain"][ind, 3] = timeDiff
-                        # Save indices of tracking errors
-                        if timeDiff > self.timeThreshold:
-                            euclid = gpxpy.geo.haversine_distance(
-                                point.longitude,
-                                point.latitude,
-                                segment.points[ind - 1].longitude,
-                                segment.points[ind - 1].latitude,
-                            )
-                            if euclid > self.distThreshold:
-                                self.gpx[fileType]["trackHoles"].append(ind)
-                                self.gpx[fileType]["trackHoleSizes"].append(euclid)
-
-        # Save features manually
         if fileType == "main":
-            self.gpx[fileType]["startTime"] = (
-                self.gpx[fileType]["parsed"].tracks[0].segments[0].points[0].time
-            )
-            self.gpx[fileType]["finishTime"] = (
-                self.gpx[fileType]["parsed"].tracks[0].segments[0].points[-1].time
-            )
-        self.gpx[fileType]["minLat"] = min(self.gpx[fileType]["plain"][:, 0])
-        self.gpx[fileType]["maxLat"] = max(self.gpx[fileType]["plain"][:, 0])
-        self.gpx[fileType]["minLong"] = min(self.gpx[fileType]["plain"][:, 1])
-        self.gpx[fileType]["maxLong"] = max(self.gpx[fileType]["plain"][:, 1])
-        self.gpx[fileType]["minEl"] = min(self.gpx[fileType]["plain"][:, 2])
-        self.gpx[fileType]["maxEl"] = max(self.gpx[fileType]["plain"][:, 2])
+            # Save indices and sizes of tracking errors
+            if holes is None:
+                holes = detect_holes(track, self.timeThreshold, self.distThreshold)
+            self.gpx[fileType]["trackHoles"] = holes.indices
+            self.gpx[fileType]["trackHoleSizes"] = holes.sizes
+
+            # Save features manually
+            self.gpx[fileType]["startTime"] = track.datetime(0)
+            self.gpx[fileType]["finishTime"] = track.datetime(-1)
+        self.gpx[fileType].update(track.bounds())
+
+        return None
+
+    def updateParam(self, track, positions, counts):
+        """
+        Updates the attributes of the main track after points have been inserted into
+        it (counts[j] points at positions[j]). Instead of analysing the whole track
+        again (see extractParam), only the inserted points and the seams around them
+        are checked.
+        """
+        from gpxfix.core import Holes, update_bounds, update_holes
+
+        main = self.gpx["main"]
+        holes = update_holes(
+            track,
+            Holes(main["trackHoles"], main["trackHoleSizes"]),
+            positions,
+            counts,
+            self.timeThreshold,
+            self.distThreshold,
+        )
+        main["track"] = track
+        main["trackHoles"] = holes.indices
+        main["trackHoleSizes"] = holes.sizes
+        main["startTime"] = track.datetime(0)
+        main["finishTime"] = track.datetime(-1)
+        shift = 0
+        for position, count in zip(positions, counts):
+            start = position + shift
+            main.update(update_bounds(main, track, start, start + count))
+            shift += count
 
         return None
 
@@ -400,6 +608,10 @@ class Window:
 
     def Merge(self):
         # This function merges the main GPX file with the snippet
+        from gpxfix.core import merge_snippet, repaired_path, write
+
+        if "tracks" in self.gpx["snip"]:
+            return self.MergeSeveral()
 
         # Error Handling
         try:
@@ -412,7 +624,7 @@ class Window:
                 100,
             )
             return None
-        if self.dist < 0:
+        if self.dist <= 0:
             self.messageWindow(
                 "Instruction",
                 """Please insert a valid distance in m and press the "OK" button.""",
@@ -422,7 +634,7 @@ class Window:
             return None
 
         try:
-            self.gpx["main"]["plain"]
+            self.gpx["main"]["track"]
         except KeyError:
             self.messageWindow(
                 "File Error",
@@ -433,7 +645,7 @@ class Window:
             return None
 
         try:
-            self.gpx["snip"]["parsed"]
+            self.gpx["snip"]["track"]
         except KeyError:
             self.messageWindow(
                 "FileError",
@@ -444,229 +656,100 @@ class Window:
             )
             return None
 
-        dataOld = self.gpx["main"]["plain"]
-        dataNew = self.gpx["snip"]["parsed"].tracks[0].segments[0].points
+        main, snip = self.gpx["main"], self.gpx["snip"]
 
-        var = np.array([dataNew[0].latitude, dataNew[0].longitude])
-
-        # Find the right position of the snippet.
-        dists = [
-            gpxpy.geo.haversine_distance(
-                *np.concatenate((dataOld[ind - 1, 0:2], var)).tolist()
-            )
-            for ind in self.gpx["main"]["trackHoles"]
-        ]
-
-        # In case, the user wants to insert a snippet at the start or the end of the track, we also record these distances.
-        self.gpx["main"]["trackHoles"].extend([0, len(dataOld)])
-        dists.append(
-            gpxpy.geo.haversine_distance(
-                *np.concatenate(
-                    (
-                        dataOld[0, 0:2],
-                        np.array([dataNew[-1].latitude, dataNew[-1].longitude]),
-                    )
-                )
+        def merge(job):
+            track, info = merge_snippet(
+                main["track"],
+                snip["track"],
+                distance=self.dist,
+                holes=main["trackHoles"],
+                time_threshold=self.timeThreshold,
+                dist_threshold=self.distThreshold,
             )
-        )
-        dists.append(
-            gpxpy.geo.haversine_distance(*np.concatenate((dataOld[-1, 0:2], var)))
-        )
+            # Save the new file
+            out_path = repaired_path(track, source=main.get("path"))
+            write(track, out_path, progress=job.progress)
+            return track, info, out_path
+
+        # Merge and write in the background, errors (e.g. a snippet that does not
+        # match) are shown by showError
+        self.runInBackground("Repairing", merge, lambda result: self.merged(*result))
+        return None
 
-        if min(dists) > self.distThreshold:
+    def MergeSeveral(self):
+        # Merges all uploaded snippets in one pass, see merge_snippets
+        from gpxfix.core import merge_snippets, repaired_path, write
+
+        try:
+            self.gpx["main"]["track"]
+        except KeyError:
             self.messageWindow(
-                "Data Error",
-                """This GPX snippet does not match to file you try to repair.""",
+                "File Error",
+                """Please upload a valid GPX main track before you try to repair it.""",
                 200,
                 100,
             )
             return None
 
-        # Create new GPX file.
-        self.new_GPX = gpxpy.gpx.GPX()
-        self.new_GPX.nsmap[
-            "gpxtpx"
-        ] = "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
-        # Create first track and segment in our GPX:
-        gpx_track = gpxpy.gpx.GPXTrack()
-        self.new_GPX.tracks.append(gpx_track)
-        gpx_segment = gpxpy.gpx.GPXTrackSegment()
-        gpx_track.segments.append(gpx_segment)
-        self.new_GPX.tracks[0].name = self.filename
-
-        # Original GPX until the error that is smoothed out
-        indO = 0
-        thresh = self.gpx["main"]["trackHoles"][np.argmin(dists)]
-        while indO < thresh:
-            point = self.gpx["main"]["parsed"].tracks[0].segments[0].points[indO]
-            trackpoint = gpxpy.gpx.GPXTrackPoint(
-                dataOld[indO, 0],
-                dataOld[indO, 1],
-                elevation=dataOld[indO, 2],
-                time=point.time,
+        main, snip = self.gpx["main"], self.gpx["snip"]
+
+        def merge(job):
+            track, info = merge_snippets(
+                main["track"],
+                snip["tracks"],
+                holes=main["trackHoles"],
+                time_threshold=self.timeThreshold,
+                dist_threshold=self.distThreshold,
             )
-            indO += 1
-            if point.extensions == []:
-                gpx_segment.points.append(trackpoint)
-                continue
-
-            # add extensions
-            extensions = {}
-            for ext in point.extensions:
-                for extchild in list(ext):
-                    extensions[extchild.tag.split("}")[-1]] = extchild.text
-            extension_string = (
-                EXTENSION_PREFIX
-                + "".join(
-                    [f"<gpxtpx:{k}>{v}</gpxtpx:{k}>" for k, v in extensions.items()]
+            if not info["positions"]:
+                raise ValueError(
+                    "None of the GPX snippets matches to file you try to repair."
                 )
-                + EXTENSION_POSTFIX
+            out_path = repaired_path(track, source=main.get("path"))
+            write(track, out_path, progress=job.progress)
+            return track, info, out_path
+
+        def done(result):
+            track, info, out_path = result
+            unmatched = [os.path.basename(snip["paths"][j]) for j in info["unmatched"]]
+            self.messageWindow(
+                title="Success!",
+                message=f"{len(info['snippets'])} snippet(s) inserted, the track is "
+                f"repaired and saved under {out_path}"
+                + (
+                    f"\nNo matching hole for: {', '.join(unmatched)}"
+                    if unmatched
+                    else ""
+                ),
+                width=250,
+                height=150,
             )
-            gpx_extension = ElementTree.fromstring(extension_string)
-            trackpoint.extensions.append(gpx_extension)
-            gpx_segment.points.append(trackpoint)
-
-        # Compute cumulative time needed for the snippet (in seconds)
-        if thresh != len(dataOld) and thresh != 0:  # Regular case
-            cum_Time = (
-                self.gpx["main"]["parsed"].tracks[0].segments[0].points[thresh].time
-                - gpx_segment.points[-1].time
-            ).total_seconds()
-
-            # Compute cumulative (pointwise) distance of GPX track and compare to GoogleMaps
-            dataNew.append(
-                gpx_segment.points[-1]
-            )  # To be able to compute distance for first point
-            cumDist = 0
-            for ind, point in enumerate(dataNew):
-                cumDist += gpxpy.geo.haversine_distance(
-                    dataNew[ind - 1].latitude,
-                    dataNew[ind - 1].longitude,
-                    point.latitude,
-                    point.longitude,
-                )
+            self.updateParam(track, info["positions"], info["counts"])
 
-            self.error = (cumDist / self.dist) - 1
+        self.runInBackground("Repairing", merge, done)
+        return None
 
-            self.speed = self.dist / cum_Time  # in meters/second
+    def merged(self, track, info, out_path):
+        # Takes over the result of Merge
+        if "error" in info:
             # Show window to inform about deviation between GM and GPX
             self.messageWindow(
                 "Error intensity ",
                 """You inserted that the GoogleMaps distance is """
-                + str(round(self.dist))
+                + str(round(info["distance"]))
                 + """m for this snippet, while the cumulative distance of GPX points is """
-                + str(round(cumDist))
+                + str(round(info["cumulative_distance"]))
                 + """m. Therefore the overestimation is """
-                + str(round(self.error, 3))
+                + str(round(info["error"], 3))
                 + """%. The algorithm smoothes this out. The average speed was """
-                + str(round(self.speed * 3.6, 2))
+                + str(round(info["speed"] * 3.6, 2))
                 + """km/h.""",
                 400,
                 200,
             )
 
-        else:  # Special case that we insert sth at beginning or end
-            self.speed = 4.16666  # Assuming a pace of 15 km/h.
-            if thresh == 0:  # Workaround if we missed the starrt
-                t = self.gpx["main"]["parsed"].tracks[0].segments[0].points[
-                    0
-                ].time - datetime.timedelta(0, self.dist / self.speed)
-                gpx_segment.points.append(
-                    gpxpy.gpx.GPXTrackPoint(
-                        dataNew[0].latitude,
-                        dataNew[0].longitude,
-                        elevation=dataNew[0].elevation,
-                        time=t,
-                    )
-                )
-
-        # Snippet GPX
-        indN = 0
-        while indN < len(dataNew) - 1:
-            # Compute distance between previous location and this location. Compute how much time this path
-            # requires, but compensate with the error such that total time will match the GM distance
-            stepDist = gpxpy.geo.haversine_distance(
-                gpx_segment.points[-1].latitude,
-                gpx_segment.points[-1].longitude,
-                dataNew[indN].latitude,
-                dataNew[indN].longitude,
-            )
-
-            # Skip data point if not futher than 10m away from last
-            if stepDist > 10:
-                stepTime = stepDist / self.speed
-                prevTime = gpx_segment.points[-1].time
-
-                point = dataNew[indN]
-                trackpoint = gpxpy.gpx.GPXTrackPoint(
-                    point.latitude,
-                    point.longitude,
-                    elevation=point.elevation,
-                    time=prevTime + datetime.timedelta(0, stepTime),
-                )
-
-                if point.extensions == []:
-                    indN += 1
-                    gpx_segment.points.append(trackpoint)
-                    continue
-
-                # add extensions
-                extensions = {}
-                for ext in point.extensions:
-                    for extchild in list(ext):
-                        extensions[extchild.tag.split("}")[-1]] = extchild.text
-                extension_string = (
-                    EXTENSION_PREFIX
-                    + "".join(
-                        [f"<gpxtpx:{k}>{v}</gpxtpx:{k}>" for k, v in extensions.items()]
-                    )
-                    + EXTENSION_POSTFIX
-                )
-                gpx_extension = ElementTree.fromstring(extension_string)
-                trackpoint.extensions.append(gpx_extension)
-                gpx_segment.points.append(trackpoint)
-            indN += 1
-
-        # Rest of original GPX
-        while indO < len(dataOld):
-            point = self.gpx["main"]["parsed"].tracks[0].segments[0].points[indO]
-            trackpoint = gpxpy.gpx.GPXTrackPoint(
-                dataOld[indO, 0],
-                dataOld[indO, 1],
-                elevation=dataOld[indO, 2],
-                time=point.time,
-            )
-            indO += 1
-
-            if point.extensions == []:
-                gpx_segment.points.append(trackpoint)
-                continue
-
-            # add extensions
-            extensions = {}
-            for ext in point.extensions:
-                for extchild in list(ext):
-                    extensions[extchild.tag.split("}")[-1]] = extchild.text
-            extension_string = (
-                EXTENSION_PREFIX
-                + "".join(
-                    [f"<gpxtpx:{k}>{v}</gpxtpx:{k}>" for k, v in extensions.items()]
-                )
-                + EXTENSION_POSTFIX
-            )
-            gpx_extension = ElementTree.fromstring(extension_string)
-            trackpoint.extensions.append(gpx_extension)
-            gpx_segment.points.append(trackpoint)
-
-        # DONE. Now save the new file
-        self.file = self.new_GPX.to_xml()
-        output_dir = os.path.join(os.path.expanduser("~"), "gpxfix")
-        os.makedirs(output_dir, exist_ok=True)
-        out_path = os.path.join(output_dir, self.filename + "_repaired.gpx")
-        f = open(out_path, "w+")
-        f.write(self.file)
-        f.close()
-        # Give confirmation message
+        # DONE. Give confirmation message
         self.messageWindow(
             title="Success!",
             message=f"The track is repaired and saved under {out_path}",
@@ -675,8 +758,78 @@ class Window:
         )
 
         # Make this file to the new file.
-        self.gpx["main"]["parsed"] = self.new_GPX
-        self.extractParam("main")
+        self.updateParam(track, [info["position"]], [info["count"]])
+
+    def FillHoles(self):
+        # This function fills all holes of the main GPX file by interpolation
+        from gpxfix.core import fill_holes, repaired_path, write
+
+        main = self.gpx["main"]
+
+        def fill(job):
+            track, info = fill_holes(
+                main["track"], holes=main["trackHoles"], spacing=self.fillSpacing
+            )
+            out_path = repaired_path(track, source=main.get("path"))
+            write(track, out_path, progress=job.progress)
+            return track, info, out_path
+
+        def done(result):
+            track, info, out_path = result
+            self.messageWindow(
+                title="Success!",
+                message=f"{len(info['positions'])} hole(s) filled with "
+                f"{sum(info['counts'])} points, the track is saved under {out_path}",
+                width=250,
+                height=150,
+            )
+            self.updateParam(track, info["positions"], info["counts"])
+            if hasattr(self, "win_links"):
+                self.win_links.destroy()
+
+        self.runInBackground("Filling holes", fill, done)
+
+    def ExportSimplified(self):
+        # This function saves a copy of the main GPX file with fewer points, the
+        # points around the holes and the points with extensions are kept
+        from gpxfix.core import repaired_path, simplify_track, write
+
+        try:
+            track = self.gpx["main"]["track"]
+        except KeyError:
+            self.messageWindow(
+                message="File Error, Please upload a valid GPX track (yellow "
+                "button) before you try to export it.",
+                width=250,
+                height=150,
+            )
+            return None
+        holes = self.gpx["main"]["trackHoles"]
+
+        def export(job):
+            simplified, _ = simplify_track(
+                track,
+                tolerance=self.resolution,
+                holes=holes,
+                dist_threshold=self.distThreshold,
+            )
+            out_path = repaired_path(
+                track, suffix="_simplified.gpx", source=self.gpx["main"].get("path")
+            )
+            write(simplified, out_path, progress=job.progress)
+            return len(simplified), out_path
+
+        def done(result):
+            count, out_path = result
+            self.messageWindow(
+                title="Success!",
+                message=f"The track is simplified from {len(track)} to {count} "
+                f"points and saved under {out_path}",
+                width=250,
+                height=150,
+            )
+
+        self.runInBackground("Exporting", export, done)
 
     def read_distance(self):
         # Read distance via button-only keypad dialog to avoid flaky text entry rendering.
@@ -0,0 +1,171 @@
+"""
+Matching of snippets to the places where they belong into a track: the holes, the
+start (snippet ends where the track begins) and the end (snippet begins where the
+track ends). These insertion slots are put into a uniform grid over the sphere, so
+all snippets are matched against all slots at once in near-linear time instead of
+comparing every snippet with every hole.
+
+Every candidate is scored with both snippet endpoints and the direction:
+
+    score = mean endpoint distance (m) + DIRECTION_PENALTY * (1 - cos(angle)) / 2
+
+where angle is the angle between the snippet (first -> last point) and the direction
+of the track across the slot (before -> after the hole, along the first/last segment
+for the start/end).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from gpxfix.geo import haversine, headings, to_cartesian
+
+# Score added (in meters) for a snippet pointing in the opposite direction
+DIRECTION_PENALTY = 100
+# Smallest grid cell (in meters), keeps the cell coordinates within 21 bits
+MIN_CELL = 10.0
+
+_BITS = 21
+_NEIGHBOURS = np.array(
+    [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)],
+    dtype=np.int64,
+)
+
+# snippet: index of the snippet, position: insertion position in the track,
+# start_error/end_error: distance (m) of the first/last snippet point to the track
+# point before/after the slot (NaN if there is none), direction: cosine of the angle
+Match = namedtuple(
+    "Match",
+    ["snippet", "position", "score", "start_error", "end_error", "direction"],
+)
+
+
+class GridIndex:
+    """
+    Uniform grid over points on the sphere (see gpxfix.geo.to_cartesian). The points
+    are sorted by cell key, so a query is a binary search for each of the 27 cells
+    around the query point.
+    """
+
+    def __init__(self, lat, lon, cell):
+        self.cell = max(float(cell), MIN_CELL)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        keys = self._keys(self._cells(self.lat, self.lon))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def _cells(self, lat, lon):
+        return np.floor(to_cartesian(lat, lon) / self.cell).astype(np.int64)
+
+    @staticmethod
+    def _keys(cells):
+        cells = cells + (1 << (_BITS - 1))
+        return (cells[..., 0] << 2 * _BITS) | (cells[..., 1] << _BITS) | cells[..., 2]
+
+    def query(self, lat, lon, radius):
+        """
+        All pairs (query index, point index) of query points and indexed points that
+        are at most radius meters apart (radius must not exceed the cell size).
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        cells = self._cells(lat, lon)[:, None, :] + _NEIGHBOURS
+        keys = self._keys(cells).ravel()
+        lo = np.searchsorted(self.keys, keys, "left")
+        hi = np.searchsorted(self.keys, keys, "right")
+        counts = hi - lo
+        queries = np.repeat(np.arange(len(keys)) // len(_NEIGHBOURS), counts)
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        points = self.order[starts + np.arange(counts.sum())]
+        dist = haversine(lat[queries], lon[queries], self.lat[points], self.lon[points])
+        close = dist <= radius
+        return queries[close], points[close]
+
+
+def slots(track, holes):
+    """
+    Insertion slots of a track: positions, index of the point before and after every
+    slot (-1 if there is none) for the holes, the start and the end.
+    """
+    holes = np.asarray(holes, dtype=np.int64)
+    n = len(track)
+    positions = np.concatenate((holes, [0, n]))
+    before = np.concatenate((holes - 1, [-1, n - 1]))
+    after = np.concatenate((holes, [0, -1]))
+    return positions, before, after
+
+
+def match_snippets(track, snippets, holes, dist_threshold):
+    """
+    Assigns snippets to the holes (or the start/end) of the track. A snippet is a
+    candidate for a slot if its entry point (the first point, the last one for the
+    start) is within dist_threshold meters of the track. Candidates are assigned
+    greedily by score, every snippet and every slot is used at most once.
+
+    Returns the matches sorted by position, unmatched snippets are left out.
+    """
+    snippets = [snippet for snippet in snippets]
+    if not snippets or not len(track):
+        return []
+    positions, before, after = slots(track, holes)
+    n_holes = len(positions) - 2
+    # Track point every slot is anchored at
+    anchor = np.where(before >= 0, before, after)
+    index = GridIndex(track.lat[anchor], track.lon[anchor], dist_threshold)
+
+    first = np.array([(s.lat[0], s.lon[0]) for s in snippets])
+    last = np.array([(s.lat[-1], s.lon[-1]) for s in snippets])
+    # Snippets enter holes and the end with their first point, the start with the last
+    ind_f, slot_f = index.query(first[:, 0], first[:, 1], dist_threshold)
+    keep = slot_f != n_holes
+    ind_l, slot_l = index.query(last[:, 0], last[:, 1], dist_threshold)
+    keep_l = slot_l == n_holes
+    snippet = np.concatenate((ind_f[keep], ind_l[keep_l]))
+    slot = np.concatenate((slot_f[keep], slot_l[keep_l]))
+    if not len(snippet):
+        return []
+
+    lat, lon = track.lat, track.lon
+    b, a = before[slot], after[slot]
+    start_error = np.where(
+        b >= 0, haversine(lat[b], lon[b], first[snippet, 0], first[snippet, 1]), np.nan
+    )
+    end_error = np.where(
+        a >= 0, haversine(last[snippet, 0], last[snippet, 1], lat[a], lon[a]), np.nan
+    )
+
+    # Direction of the track across the slot, along the first/last step at the ends
+    last_ind = len(track) - 1
+    src = np.where(b >= 0, b, 0)
+    dst = np.where(a >= 0, a, last_ind)
+    src = np.where(a < 0, max(last_ind - 1, 0), src)
+    dst = np.where(b < 0, min(1, last_ind), dst)
+    slot_dir = headings(lat[src], lon[src], lat[dst], lon[dst])
+    snippet_dir = headings(
+        first[snippet, 0], first[snippet, 1], last[snippet, 0], last[snippet, 1]
+    )
+    direction = (slot_dir * snippet_dir).sum(axis=-1)
+    # Without a direction (single point snippet or track), nothing is penalized
+    direction[~((slot_dir != 0).any(axis=-1) & (snippet_dir != 0).any(axis=-1))] = 1
+
+    score = np.nanmean(np.stack((start_error, end_error)), axis=0)
+    score += DIRECTION_PENALTY * (1 - direction) / 2
+
+    matches, used_snippets, used_slots = [], set(), set()
+    for k in np.lexsort((slot, snippet, score)).tolist():
+        if snippet[k] in used_snippets or slot[k] in used_slots:
+            continue
+        used_snippets.add(snippet[k])
+        used_slots.add(slot[k])
+        matches.append(
+            Match(
+                int(snippet[k]),
+                int(positions[slot[k]]),
+                float(score[k]),
+                float(start_error[k]),
+                float(end_error[k]),
+                float(direction[k]),
+            )
+        )
+    return sorted(matches, key=lambda match: (match.position, match.snippet))
@@ -0,0 +1,296 @@
+"""
+Streaming GPX reader. The file is fed to expat incrementally and the parser callbacks
+write the trackpoints straight into the columnar arrays of a gpxfix.track.Track,
+without ever materializing a gpxpy DOM (or any element tree). The values are buffered
+in fixed-size chunks, so peak memory is bounded by the chunk size (plus the resulting
+arrays), not by the file size.
+"""
+
+import datetime
+import os
+import re
+from xml.etree import ElementTree
+
+import numpy as np
+
+from gpxfix.extensions import Extensions, escape, qualified_name, quoteattr
+from gpxfix.profiling import count, stage
+from gpxfix.track import NO_TIME, Track, to_epoch
+
+# Number of trackpoints per chunk and number of bytes fed to the parser at once
+CHUNK_SIZE = 65536
+READ_SIZE = 1 << 20
+GPX_NAMESPACES = {
+    "http://www.topografix.com/GPX/1/0",
+    "http://www.topografix.com/GPX/1/1",
+}
+
+_TIMEZONE = re.compile(r"T.*[+-]\d\d:?\d\d$")
+_ISO = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:[.,](\d+))?"
+    r"(Z|[+-]\d\d:?\d\d)?$"
+)
+
+
+def parse_times(strings):
+    """
+    Converts ISO 8601 timestamps (str or None) to epoch microseconds. UTC ("Z") and
+    naive timestamps are parsed in one vectorized call, anything else one by one.
+    """
+    epochs = np.full(len(strings), NO_TIME, dtype=np.int64)
+    present = [i for i, s in enumerate(strings) if s]
+    if not present:
+        return epochs
+    values = [strings[i].strip() for i in present]
+    utc = [v[:-1] if v[-1] == "Z" else v for v in values]
+    if not any(_TIMEZONE.search(v) for v in utc):
+        try:
+            epochs[present] = np.array(utc, dtype="datetime64[us]").astype(np.int64)
+            return epochs
+        except ValueError:
+            pass
+    epochs[present] = [_parse_time(v) for v in values]
+    return epochs
+
+
+def _parse_time(value):
+    match = _ISO.match(value)
+    if match is None:
+        raise ValueError(f"Invalid GPX timestamp: {value!r}")
+    *fields, fraction, zone = match.groups()
+    time = datetime.datetime(
+        *map(int, fields), microsecond=int((fraction or "0")[:6].ljust(6, "0"))
+    )
+    if zone and zone != "Z":
+        sign = -1 if zone[0] == "-" else 1
+        zone = zone[1:].replace(":", "")
+        time -= sign * datetime.timedelta(hours=int(zone[:2]), minutes=int(zone[2:]))
+    return to_epoch(time)
+
+
+class _ChunkBuffer:
+    """Fixed-size buffers for one chunk of trackpoints."""
+
+    def __init__(self, size):
+        self.size = size
+        self.lat = np.empty(size, dtype=np.float64)
+        self.lon = np.empty(size, dtype=np.float64)
+        self.ele = np.empty(size, dtype=np.float64)
+        self.times = [None] * size
+        self.payloads = [b""] * size
+        self.fill = 0
+        self.chunks = []
+
+    def append(self, lat, lon, ele, time, payload):
+        i = self.fill
+        self.lat[i], self.lon[i], self.ele[i] = lat, lon, ele
+        self.times[i], self.payloads[i] = time, payload
+        self.fill += 1
+        if self.fill == self.size:
+            self.flush()
+
+    def flush(self):
+        n = self.fill
+        if not n:
+            return
+        self.chunks.append(
+            (
+                self.lat[:n].copy(),
+                self.lon[:n].copy(),
+                self.ele[:n].copy(),
+                parse_times(self.times[:n]),
+                Extensions.from_payloads(self.payloads[:n]),
+            )
+        )
+        self.fill = 0
+
+    def columns(self):
+        self.flush()
+        if not self.chunks:
+            empty = np.zeros(0, dtype=np.float64)
+            return empty, empty, empty, empty.astype(np.int64), Extensions()
+        lat, lon, ele, time, ext = zip(*self.chunks)
+        return (
+            np.concatenate(lat),
+            np.concatenate(lon),
+            np.concatenate(ele),
+            np.concatenate(time),
+            Extensions.concatenate(ext),
+        )
+
+
+class _GPXTarget:
+    """
+    Parser target receiving the expat callbacks. Trackpoints are written straight into
+    the chunk buffer, no element objects are created at all.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offsets, self.count = [0], 0
+        self.tracks, self.track_names = [0], []
+        self.prefixes, self.namespaces = {}, {}
+        self.locals, self.qnames = {}, {}
+        self.path = []
+        self.text = []
+        self.lat = self.lon = self.ele = self.time = None
+        self.payload = b""
+        # Serialized pieces of the current <extensions> element (None if outside)
+        self.ext = None
+        self.ext_empty = False
+
+    def start_ns(self, prefix, uri):
+        # Extension payloads are written with prefixes, also for namespaces that are
+        # declared as default namespace on the extension element itself. All of them
+        # are declared on <gpx>, so a prefix that is taken already (by a generated one
+        # or by another scope) is replaced by a free one.
+        if uri not in self.prefixes and uri not in GPX_NAMESPACES:
+            n = len(self.prefixes)
+            while not prefix or prefix in self.namespaces:
+                prefix, n = f"ns{n}", n + 1
+            self.prefixes[uri] = prefix
+            self.namespaces[prefix] = uri
+
+    def local(self, tag):
+        try:
+            return self.locals[tag]
+        except KeyError:
+            self.locals[tag] = tag.rsplit("}", 1)[-1]
+            return self.locals[tag]
+
+    def qname(self, tag):
+        try:
+            return self.qnames[tag]
+        except KeyError:
+            self.qnames[tag] = qualified_name(tag, self.prefixes)
+            return self.qnames[tag]
+
+    def ext_text(self):
+        if not self.text:
+            return
+        text = "".join(self.text).strip()
+        self.text = []
+        if text:
+            self.ext.append(escape(text))
+            self.ext_empty = False
+
+    def start(self, tag, attrib):
+        if self.ext is not None:
+            self.ext_text()
+            attrs = ""
+            if attrib:
+                attrs = "".join(
+                    f" {self.qname(k)}={quoteattr(v)}" for k, v in attrib.items()
+                )
+            self.ext.append(f"<{self.qname(tag)}{attrs}>")
+            self.ext_empty = True
+            self.path.append(None)
+            return
+        local = self.local(tag)
+        if local == "trkpt":
+            self.lat, self.lon = float(attrib["lat"]), float(attrib["lon"])
+        elif local == "extensions" and self.path and self.path[-1] == "trkpt":
+            self.ext = []
+        elif local == "trk":
+            self.track_names.append("")
+        self.path.append(local)
+        self.text = []
+
+    def data(self, data):
+        self.text.append(data)
+
+    def end(self, tag):
+        local = self.path.pop()
+        if local is None:
+            # Element inside <extensions>
+            self.ext_text()
+            if self.ext_empty:
+                self.ext[-1] = self.ext[-1][:-1] + "/>"
+            else:
+                self.ext.append(f"</{self.qname(tag)}>")
+            self.ext_empty = False
+            return
+        parent = self.path[-1] if self.path else None
+        if local == "trkpt":
+            self.buffer.append(
+                self.lat,
+                self.lon,
+                np.nan if self.ele is None else float(self.ele),
+                self.time,
+                self.payload,
+            )
+            self.count += 1
+            self.ele = self.time = None
+            self.payload = b""
+        elif parent == "trkpt":
+            if local == "ele":
+                self.ele = "".join(self.text) or None
+            elif local == "time":
+                self.time = "".join(self.text)
+            elif local == "extensions":
+                self.payload = "".join(self.ext).encode("utf-8")
+                self.ext = None
+        elif local == "trkseg":
+            self.offsets.append(self.count)
+        elif local == "trk":
+            self.tracks.append(len(self.offsets) - 1)
+        elif local == "name" and parent == "trk":
+            self.track_names[-1] = "".join(self.text).strip()
+        self.text = []
+
+    def close(self):
+        return None
+
+
+def _file_size(f):
+    try:
+        return os.fstat(f.fileno()).st_size
+    except (AttributeError, OSError):
+        return None
+
+
+def read_gpx(source, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Reads all tracks and track segments of a GPX file (path or binary file object)
+    into one gpxfix.track.Track. Extension payloads are kept as raw bytes (see
+    gpxfix.extensions), routes and waypoints are skipped.
+
+    progress is called after every block that is read, with the fraction of the file
+    read so far (None if the size is unknown). It may raise to abort reading.
+    """
+    buffer = _ChunkBuffer(chunk_size)
+    target = _GPXTarget(buffer)
+    parser = ElementTree.XMLParser(target=target)
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        size = _file_size(f) if progress is not None else None
+        position = 0
+        with stage("parse"):
+            data = f.read(READ_SIZE)
+            while data:
+                parser.feed(data)
+                if progress is not None:
+                    position += len(data)
+                    progress(min(position / size, 1.0) if size else None)
+                data = f.read(READ_SIZE)
+            parser.close()
+    finally:
+        if f is not source:
+            f.close()
+
+    with stage("build"):
+        lat, lon, ele, time, extensions = buffer.columns()
+    count("points parsed", len(lat))
+    # Only the track names are kept, the name of the file (<metadata><name>) would
+    # be written as track name
+    return Track(
+        lat,
+        lon,
+        ele,
+        time,
+        target.offsets,
+        extensions=extensions,
+        namespaces=target.namespaces,
+        tracks=target.tracks if target.track_names else None,
+        track_names=target.track_names,
+    )
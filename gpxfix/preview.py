@@ -0,0 +1,337 @@
+"""
+In-app preview of a track with its holes highlighted. The track is projected to
+meters around its center and simplified into a level-of-detail pyramid (see
+gpxfix.simplify): level 0 has all points, every further level is simplified with
+LEVEL_FACTOR times the tolerance of the previous one, down to about MAX_POINTS points.
+A frame only draws the level whose tolerance is below one pixel at the current zoom,
+and of that level only the points in view, so panning and zooming stay fast for
+tracks of any length.
+
+The pyramid and the frames are computed by a background thread. The Tk main loop
+polls the results with after() and only draws the latest frame; while dragging or
+zooming, the drawn items are moved and scaled right away and redrawn once the new
+frame is ready.
+"""
+
+import queue
+import threading
+from tkinter import Canvas, Label, Toplevel
+
+import numpy as np
+
+from gpxfix.constants import SIMPLIFY_TOLERANCE
+from gpxfix.geo import EARTH_RADIUS
+from gpxfix.simplify import anchors, rdp_mask
+from gpxfix.track import Track
+
+# Tolerance ratio of consecutive levels and size of the coarsest level
+LEVEL_FACTOR = 4
+MAX_POINTS = 2000
+# Interval (ms) in which the Tk main loop polls for finished frames
+POLL_INTERVAL = 30
+ZOOM_STEP = 1.25
+
+TRACK_COLOR = "#1f5fbf"
+HOLE_COLOR = "red"
+
+
+class Pyramid:
+    """
+    Level-of-detail pyramid of a track. levels[k] are the indices of the points of
+    level k, tolerances[k] the simplification tolerance in meters (0 for level 0).
+    """
+
+    def __init__(self, track, holes=(), tolerance=SIMPLIFY_TOLERANCE):
+        n = len(track)
+        self.holes = np.asarray(holes, dtype=np.int64)
+        self.lat0 = (np.nanmin(track.lat) + np.nanmax(track.lat)) / 2 if n else 0.0
+        self.lon0 = (np.nanmin(track.lon) + np.nanmax(track.lon)) / 2 if n else 0.0
+        self.x, self.y = self.project(track.lat, track.lon)
+        self.segment = np.repeat(np.arange(track.n_segments), np.diff(track.offsets))
+        self.levels = [np.arange(n)]
+        self.tolerances = [0.0]
+        keep = anchors(track, self.holes, keep_extensions=False)
+        x0, y0, x1, y1 = self.bounds()
+        # Beyond the extent of the track, only the anchors are left
+        extent = np.hypot(x1 - x0, y1 - y0)
+        tol = max(float(tolerance), 1e-3)
+        while len(self.levels[-1]) > MAX_POINTS and tol < LEVEL_FACTOR * extent:
+            indices = self.levels[-1]
+            # Simplify the previous level, which is much smaller than the track
+            level = Track(
+                track.lat[indices],
+                track.lon[indices],
+                np.zeros(len(indices)),
+                np.zeros(len(indices), dtype=np.int64),
+                np.searchsorted(indices, track.offsets),
+            )
+            mask = rdp_mask(level, tol, keep[indices])
+            if mask.all():
+                tol *= LEVEL_FACTOR
+                continue
+            self.levels.append(indices[mask])
+            self.tolerances.append(tol)
+            tol *= LEVEL_FACTOR
+
+    def project(self, lat, lon):
+        """Equirectangular projection (in m) around the center of the track."""
+        y = EARTH_RADIUS * np.radians(np.asarray(lat) - self.lat0)
+        x = EARTH_RADIUS * np.radians(np.asarray(lon) - self.lon0)
+        return x * np.cos(np.radians(self.lat0)), y
+
+    def bounds(self, indices=None):
+        """Bounding box (x0, y0, x1, y1) of the points (all by default)."""
+        x = self.x if indices is None else self.x[indices]
+        y = self.y if indices is None else self.y[indices]
+        if not len(x):
+            return (-1.0, -1.0, 1.0, 1.0)
+        return (x.min(), y.min(), x.max(), y.max())
+
+    def level_for(self, meters_per_pixel):
+        """Coarsest level whose tolerance is below one pixel."""
+        fine = np.flatnonzero(np.asarray(self.tolerances) <= meters_per_pixel)
+        return int(fine[-1])
+
+    def frame(self, view):
+        """
+        Screen coordinates of the visible part of the track: a list of polylines
+        (flat [x0, y0, x1, y1, ...] lists) and a list of hole lines (x0, y0, x1, y1).
+        """
+        indices = self.levels[self.level_for(1 / view.scale)]
+        sx, sy = view.to_screen(self.x[indices], self.y[indices])
+        margin = 2
+        inside = (
+            (sx >= -margin)
+            & (sx <= view.width + margin)
+            & (sy >= -margin)
+            & (sy <= view.height + margin)
+        )
+        # The neighbours of visible points are drawn too, so lines leaving the view
+        # are not cut off
+        visible = inside.copy()
+        visible[1:] |= inside[:-1]
+        visible[:-1] |= inside[1:]
+        positions = np.flatnonzero(visible)
+        segment = self.segment[indices[positions]]
+        breaks = np.flatnonzero((np.diff(positions) != 1) | (np.diff(segment) != 0)) + 1
+        coords = np.stack((sx[positions], sy[positions]), axis=1).round(1)
+        lines = [
+            part.ravel().tolist() for part in np.split(coords, breaks) if len(part) > 1
+        ]
+        after = self.holes
+        hx0, hy0 = view.to_screen(self.x[after - 1], self.y[after - 1])
+        hx1, hy1 = view.to_screen(self.x[after], self.y[after])
+        holes = np.stack((hx0, hy0, hx1, hy1), axis=1).round(1).tolist()
+        return lines, holes
+
+
+class View:
+    """Screen transform: center (cx, cy) in m, scale in pixels per m."""
+
+    def __init__(self, cx, cy, scale, width, height):
+        self.cx, self.cy, self.scale = cx, cy, scale
+        self.width, self.height = width, height
+
+    @classmethod
+    def fit(cls, bounds, width, height, padding=0.05):
+        x0, y0, x1, y1 = bounds
+        span = max((x1 - x0) / width, (y1 - y0) / height, 1e-6)
+        return cls(
+            (x0 + x1) / 2, (y0 + y1) / 2, 1 / (span * (1 + 2 * padding)), width, height
+        )
+
+    def copy(self):
+        return View(self.cx, self.cy, self.scale, self.width, self.height)
+
+    def to_screen(self, x, y):
+        return (
+            (x - self.cx) * self.scale + self.width / 2,
+            self.height / 2 - (y - self.cy) * self.scale,
+        )
+
+    def to_world(self, sx, sy):
+        return (
+            self.cx + (sx - self.width / 2) / self.scale,
+            self.cy - (sy - self.height / 2) / self.scale,
+        )
+
+
+class Renderer(threading.Thread):
+    """
+    Background thread building the pyramid and computing frames. Only the latest
+    requested view is rendered, the results are fetched with poll().
+    """
+
+    def __init__(self, track, holes, tolerance):
+        super().__init__(daemon=True)
+        self.args = (track, holes, tolerance)
+        self.pyramid = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+
+    def run(self):
+        try:
+            self.pyramid = Pyramid(*self.args)
+        except Exception as error:
+            self.results.put(("error", error))
+            return
+        self.args = None
+        self.results.put(("ready", self.pyramid))
+        while True:
+            request = self.requests.get()
+            # Skip to the latest request
+            while not self.requests.empty():
+                request = self.requests.get()
+            if request is None:
+                return
+            generation, view = request
+            self.results.put(("frame", (generation, self.pyramid.frame(view))))
+
+    def request(self, generation, view):
+        self.requests.put((generation, view))
+
+    def stop(self):
+        self.requests.put(None)
+
+    def poll(self):
+        """All results that are ready, without waiting."""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+
+class PreviewWindow:
+    """
+    Toplevel window with the preview of a track. Drag to pan, use the mouse wheel
+    (or +/-) to zoom and "0" to show the whole track. With focus, the view is
+    centered on the hole before that point index.
+    """
+
+    def __init__(self, master, track, holes, tolerance=SIMPLIFY_TOLERANCE, focus=None):
+        self.win = Toplevel(master)
+        self.win.wm_title("Track preview")
+        self.canvas = Canvas(self.win, width=800, height=600, bg="white")
+        self.canvas.pack(fill="both", expand=True)
+        self.status = Label(self.win, text="Rendering preview ...", anchor="w")
+        self.status.pack(fill="x")
+        self.focus = focus
+        self.view = None
+        self.generation = 0
+        self.drawn = -1
+        self.drag = None
+
+        self.renderer = Renderer(track, holes, tolerance)
+        self.renderer.start()
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(ZOOM_STEP, event))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(1 / ZOOM_STEP, event))
+        self.win.bind("<Key>", self.on_key)
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        self.win.after(POLL_INTERVAL, self.poll)
+
+    def size(self):
+        # Before the window is mapped, its size is 1x1
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return self.canvas.winfo_reqwidth(), self.canvas.winfo_reqheight()
+        return width, height
+
+    def fit(self):
+        pyramid = self.renderer.pyramid
+        bounds = pyramid.bounds()
+        if self.focus is not None:
+            # The hole with some context around it
+            x0, y0, x1, y1 = pyramid.bounds([self.focus - 1, self.focus])
+            pad = max(x1 - x0, y1 - y0, 50.0)
+            bounds = (x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+            self.focus = None
+        self.view = View.fit(bounds, *self.size())
+        self.refresh()
+
+    def refresh(self):
+        if self.view is None:
+            return
+        self.generation += 1
+        self.renderer.request(self.generation, self.view.copy())
+
+    def poll(self):
+        for kind, result in self.renderer.poll():
+            if kind == "ready":
+                self.fit()
+                self.status.configure(
+                    text=f"{len(result.x)} points, {len(result.holes)} hole(s)"
+                )
+            elif kind == "error":
+                self.status.configure(text=f"Preview failed: {result}")
+            elif result[0] == self.generation and result[0] != self.drawn:
+                self.draw(*result[1])
+                self.drawn = result[0]
+        if self.win.winfo_exists():
+            self.win.after(POLL_INTERVAL, self.poll)
+
+    def draw(self, lines, holes):
+        self.canvas.delete("all")
+        for coords in lines:
+            self.canvas.create_line(*coords, fill=TRACK_COLOR, width=2)
+        for x0, y0, x1, y1 in holes:
+            self.canvas.create_line(
+                x0, y0, x1, y1, fill=HOLE_COLOR, width=3, dash=(6, 4)
+            )
+            for x, y in ((x0, y0), (x1, y1)):
+                self.canvas.create_oval(
+                    x - 4, y - 4, x + 4, y + 4, outline=HOLE_COLOR, width=2
+                )
+
+    def on_resize(self, event):
+        if self.view is None:
+            return
+        self.view.width, self.view.height = event.width, event.height
+        self.refresh()
+
+    def on_press(self, event):
+        self.drag = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.view is None or self.drag is None:
+            return
+        dx, dy = event.x - self.drag[0], event.y - self.drag[1]
+        self.drag = (event.x, event.y)
+        self.canvas.move("all", dx, dy)
+        self.view.cx -= dx / self.view.scale
+        self.view.cy += dy / self.view.scale
+        self.refresh()
+
+    def on_wheel(self, event):
+        self.zoom(ZOOM_STEP if event.delta > 0 else 1 / ZOOM_STEP, event)
+
+    def zoom(self, factor, event=None):
+        if self.view is None:
+            return
+        width, height = self.size()
+        sx, sy = (event.x, event.y) if event else (width / 2, height / 2)
+        # Keep the point under the cursor in place
+        x, y = self.view.to_world(sx, sy)
+        self.view.scale *= factor
+        self.view.cx = x - (sx - width / 2) / self.view.scale
+        self.view.cy = y + (sy - height / 2) / self.view.scale
+        self.canvas.scale("all", sx, sy, factor, factor)
+        self.refresh()
+
+    def on_key(self, event):
+        if event.char in ("+", "="):
+            self.zoom(ZOOM_STEP)
+        elif event.char == "-":
+            self.zoom(1 / ZOOM_STEP)
+        elif event.char == "0" and self.view is not None:
+            self.fit()
+
+    def close(self):
+        self.renderer.stop()
+        self.win.destroy()
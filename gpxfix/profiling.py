@@ -0,0 +1,219 @@
+"""
+Lightweight instrumentation of the engine: wall time per stage (parse, build, dedup,
+clean, holes, match, merge, serialize, write, ...), counters (points parsed, duplicates
+removed, points written, ...) and the peak memory (RSS) of the process.
+
+It is off by default. The gpxfix command (GUI included) enables it with
+--profile REPORT.json and --profile-stats FILE (a cProfile dump, to be read with
+pstats or snakeviz) or with the environment variables
+
+    GPXFIX_PROFILE=report.json        JSON report, "-" for stderr
+    GPXFIX_PROFILE_STATS=gpxfix.prof  cProfile stats (calling thread and worker)
+
+Library code uses profiled() or enable()/disable(). Stages can nest (e.g. holes
+inside merge_snippet), nested time is counted in both stages. Only the calling
+process is recorded, so profile scans with --jobs 1. cProfile only sees the thread
+that enabled it, so the GUI worker (see gpxfix.worker) profiles its jobs with
+thread_profile(); on Python 3.12+, where only one profiler can be active at a time,
+the worker jobs are missing from the stats.
+
+Stages are recorded by the engine with
+
+    with stage("parse"):
+        ...
+    count("points parsed", n)
+
+at the level of whole operations or chunks, never per point. While disabled, stage()
+returns a shared no-op context manager and count() returns right away.
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_DISABLED = contextlib.nullcontext()
+# The report being recorded, None while disabled
+_report = None
+# Profilers of other threads (see thread_profile), None unless stats are dumped
+_thread_profilers = None
+_lock = threading.Lock()
+
+
+def peak_rss():
+    """Peak resident memory of the process in MB (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Report:
+    """Stage timings and counters, see above."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        peak = peak_rss()
+        with self._lock:
+            entry = self.stages.setdefault(
+                name, {"calls": 0, "seconds": 0.0, "peak_rss_mb": None}
+            )
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["peak_rss_mb"] = peak
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        """The machine-readable report."""
+        with self._lock:
+            return {
+                "seconds": time.perf_counter() - self.started,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "counters": dict(self.counters),
+                "peak_rss_mb": peak_rss(),
+                "argv": sys.argv,
+                "python": sys.version.split()[0],
+            }
+
+
+class _Stage:
+    __slots__ = ("report", "name", "start")
+
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager timing a stage (a no-op while disabled)."""
+    report = _report
+    if report is None:
+        return _DISABLED
+    return _Stage(report, name)
+
+
+def count(name, value=1):
+    """Adds value to a counter (nothing while disabled)."""
+    report = _report
+    if report is not None:
+        report.count(name, value)
+
+
+class _ThreadProfile:
+    __slots__ = ("profiler",)
+
+    def __enter__(self):
+        import cProfile
+
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+)
+            self.profiler = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            with _lock:
+                if _thread_profilers is not None:
+                    _thread_profilers.append(self.profiler)
+        return False
+
+
+def thread_profile():
+    """
+    Context manager running its block under cProfile while profiled() dumps stats,
+    for threads other than the calling one (a no-op otherwise).
+    """
+    if _thread_profilers is None:
+        return _DISABLED
+    return _ThreadProfile()
+
+
+def enabled():
+    return _report is not None
+
+
+def enable():
+    """Starts recording a new report and returns it."""
+    global _report
+    _report = Report()
+    return _report
+
+
+def disable():
+    """Stops recording, returns the report (None if it was not enabled)."""
+    global _report
+    report, _report = _report, None
+    return report
+
+
+def write_report(report, path="-"):
+    """Writes the report as JSON to path ("-" or None: stderr)."""
+    data = json.dumps(report.as_dict(), indent=1)
+    if not path or path == "-":
+        print(data, file=sys.stderr)
+        return
+    with open(path, "w") as f:
+        f.write(data + "\n")
+
+
+@contextlib.contextmanager
+def profiled(report_path="-", stats_path=None):
+    """
+    Records a report for the with block and writes it to report_path at the end
+    (also if the block raises), None writes no report. With stats_path, the calling
+    thread (and every thread_profile block) additionally runs under cProfile and the
+    combined stats are dumped there.
+    """
+    global _thread_profilers
+    report = enable()
+    profiler = None
+    if stats_path:
+        import cProfile
+
+        with _lock:
+            _thread_profilers = []
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler is not None:
+            import pstats
+
+            profiler.disable()
+            with _lock:
+                profilers, _thread_profilers = _thread_profilers, None
+            stats = pstats.Stats(profiler)
+            for other in profilers:
+                stats.add(other)
+            stats.dump_stats(stats_path)
+        disable()
+        if report_path:
+            write_report(report, report_path)
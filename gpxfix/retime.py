@@ -0,0 +1,144 @@
+"""
+Timestamps for the points of a snippet that is inserted into a track, computed as
+array operations: cumulative distances along the snippet, a decimation mask that
+keeps one point per MIN_STEP meters and int64 microsecond offsets via cumsum.
+
+The speed along the snippet follows one of the PROFILES:
+
+    distance    the GoogleMaps distance of the snippet is covered in the time gap of
+                the hole (at the start/end, the distance takes as long as at speed)
+    constant    the given speed
+    neighbours  the speed of the real track around the insertion (the last and first
+                NEIGHBOUR_POINTS points), blended linearly from the speed before to
+                the speed after and scaled to the time gap of a hole
+
+Inside a hole, the timestamps are compressed if the snippet would take longer than
+the time gap, so they never run past the track point after the hole.
+"""
+
+import numpy as np
+
+from gpxfix.constants import PROFILES
+from gpxfix.geo import consecutive, haversine
+from gpxfix.track import NO_TIME
+
+# Snippet points closer than this (in m, along the snippet) are skipped
+MIN_STEP = 10
+# Number of track points on either side used for the neighbours profile
+NEIGHBOUR_POINTS = 30
+
+
+def decimate(cum, min_step=MIN_STEP):
+    """
+    Mask keeping the first point and the first point after every multiple of min_step
+    meters of the cumulative distances cum.
+    """
+    bins = np.floor(np.asarray(cum) / min_step).astype(np.int64)
+    keep = np.ones(len(bins), dtype=bool)
+    keep[1:] = bins[1:] > bins[:-1]
+    return keep
+
+
+def neighbour_speed(track, start, stop):
+    """
+    Average speed (m/s) of the track points start:stop, None if it cannot be derived
+    (too few points or missing timestamps).
+    """
+    start, stop = max(start, 0), min(stop, len(track))
+    if stop - start < 2:
+        return None
+    time = track.time[start:stop]
+    if (time == NO_TIME).any() or time[-1] <= time[0]:
+        return None
+    dist = consecutive(track.lat[start:stop], track.lon[start:stop]).sum()
+    return dist / ((time[-1] - time[0]) / 1e6)
+
+
+def _neighbour_speeds(track, position, default):
+    # Speeds of the segments before and after the insertion position
+    segment = np.searchsorted(track.offsets, position, "right") - 1
+    before = after = None
+    if position > 0:
+        first = track.offsets[np.searchsorted(track.offsets, position - 1, "right") - 1]
+        before = neighbour_speed(
+            track, max(first, position - NEIGHBOUR_POINTS), position
+        )
+    if position < len(track):
+        last = track.offsets[min(segment + 1, track.n_segments)]
+        after = neighbour_speed(track, position, min(last, position + NEIGHBOUR_POINTS))
+    before = before or after or default
+    after = after or before
+    return before, after
+
+
+def retime(track, snippet, position, distance, profile="distance", speed=None):
+    """
+    Timestamps of a snippet inserted before point position of the track. distance is
+    the length of the snippet according to GoogleMaps and speed the speed (m/s) of
+    the constant profile and at the start/end of the track.
+
+    Returns the indices of the kept snippet points, their timestamps (int64 epoch
+    microseconds) and the average speed.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown speed profile {profile!r}, use one of {PROFILES}.")
+    n = len(track)
+    # Cumulative distances along the snippet, starting at the point before the hole
+    anchored = position > 0
+    if anchored:
+        lat = np.concatenate(([track.lat[position - 1]], snippet.lat))
+        lon = np.concatenate(([track.lon[position - 1]], snippet.lon))
+    else:
+        lat, lon = snippet.lat, snippet.lon
+    cum = np.cumsum(consecutive(lat, lon))
+    mask = decimate(cum)
+    keep = np.flatnonzero(mask[1:] if anchored else mask)
+    kept = cum[mask]
+    steps = np.diff(kept)
+
+    # Remaining distance to the track point after the snippet (if any)
+    closing = 0.0
+    if position < n:
+        closing = cum[-1] - kept[-1]
+        closing += haversine(lat[-1], lon[-1], track.lat[position], track.lon[position])
+    hole = 0 < position < n
+    gap = (track.time[position] - track.time[position - 1]) / 1e6 if hole else None
+
+    if profile == "constant":
+        speeds = np.full(len(steps), float(speed))
+        closing_speed = float(speed)
+    elif profile == "distance":
+        if hole:
+            average = distance / gap
+        else:
+            # Length of the snippet itself, which corresponds to distance
+            path = cum[-1] - cum[1] if anchored else cum[-1]
+            average = speed * path / distance if path else speed
+        speeds = np.full(len(steps), average)
+        closing_speed = average
+    else:
+        before, after = _neighbour_speeds(track, position, speed)
+        # Fraction of the way covered at the end of every step
+        total = kept[-1] + closing
+        ends = kept[1:] / total if total else np.ones(len(steps))
+        speeds = before + (after - before) * ends
+        closing_speed = after
+
+    seconds = np.divide(steps, speeds, out=np.zeros(len(steps)), where=speeds > 0)
+    closing_seconds = closing / closing_speed if closing_speed else 0.0
+    if hole:
+        # The neighbours profile fills the gap exactly, no profile may overrun it
+        covered = seconds.sum() + closing_seconds
+        if covered > 0 and (profile == "neighbours" or covered > gap):
+            seconds *= gap / covered
+            closing_seconds *= gap / covered
+
+    offsets = np.concatenate(([0], np.cumsum((seconds * 1e6).astype(np.int64))))
+    if anchored:
+        times = track.time[position - 1] + offsets[1:]
+    else:
+        # Missed start: the snippet ends at the first track point
+        times = track.time[0] - int(closing_seconds * 1e6) - offsets[-1] + offsets
+    duration = offsets[-1] / 1e6
+    average_speed = kept[-1] / duration if duration > 0 else speed
+    return keep, times.astype(np.int64), average_speed
@@ -0,0 +1,130 @@
+"""
+Simplification of tracks for previews and for sharing, as boolean keep-masks over the
+points of a gpxfix.track.Track:
+
+    rdp     Ramer-Douglas-Peucker: a point is dropped if it is at most tolerance
+            meters away from the line between the kept points around it
+    stride  every stride-th point of every segment
+
+Both always keep the anchors: the first and last point of every segment, the points
+on either side of the holes and (unless disabled) the points with extensions, whose
+payloads would otherwise be lost. RDP works on all sections between anchors at once,
+one vectorized pass per level of splits instead of one recursion per point.
+"""
+
+import numpy as np
+
+from gpxfix.constants import SIMPLIFY_METHODS, SIMPLIFY_TOLERANCE
+from gpxfix.geo import to_cartesian
+
+
+def anchors(track, holes=(), keep_extensions=True):
+    """Mask of the points every simplification keeps, see above."""
+    keep = track.segment_starts()
+    ends = track.offsets[1:] - 1
+    keep[ends[ends >= 0]] = True
+    holes = np.asarray(holes, dtype=np.int64)
+    keep[holes] = True
+    keep[holes[holes > 0] - 1] = True
+    if keep_extensions:
+        keep |= track.extensions.lengths() > 0
+    return keep
+
+
+def stride_mask(track, stride, keep=None):
+    """Keeps every stride-th point of every segment (and the points of keep)."""
+    n = len(track)
+    mask = np.zeros(n, dtype=bool) if keep is None else keep.copy()
+    if not n:
+        return mask
+    # Index of every point within its segment
+    starts = np.repeat(track.offsets[:-1], np.diff(track.offsets))
+    mask |= (np.arange(n) - starts) % max(int(stride), 1) == 0
+    return mask
+
+
+def _exclusive_cumsum(values):
+    out = np.zeros(len(values), dtype=np.int64)
+    np.cumsum(values[:-1], out=out[1:])
+    return out
+
+
+def rdp_mask(track, tolerance, keep=None, max_length=None):
+    """
+    Ramer-Douglas-Peucker keep-mask with a tolerance in meters. The points of keep
+    (at least the first and last point of every segment, see anchors) are always
+    kept and split the track into independent sections. With max_length, sections
+    whose kept endpoints are further apart (in m) are split as well, so simplifying
+    never opens gaps longer than max_length.
+    """
+    n = len(track)
+    mask = anchors(track, keep_extensions=False) if keep is None else keep.copy()
+    if n < 3:
+        return np.ones(n, dtype=bool)
+    x, y, z = to_cartesian(track.lat, track.lon).T.copy()
+    kept = np.flatnonzero(mask)
+    lo, hi = kept[:-1], kept[1:]
+    # Consecutive kept points of different segments are adjacent, so the sections
+    # never span a segment boundary
+    while len(lo):
+        interior = hi - lo - 1
+        active = interior > 0
+        lo, hi, interior = lo[active], hi[active], interior[active]
+        if not len(lo):
+            break
+        starts = _exclusive_cumsum(interior)
+        section = np.repeat(np.arange(len(lo)), interior)
+        points = np.arange(len(section)) + np.repeat(lo + 1 - starts, interior)
+        # Squared distances of every interior point to the chord of its section (to
+        # the start if the chord has no length, e.g. for loops)
+        cx, cy, cz = x[hi] - x[lo], y[hi] - y[lo], z[hi] - z[lo]
+        length = cx * cx + cy * cy + cz * cz
+        ox = x[points] - np.repeat(x[lo], interior)
+        oy = y[points] - np.repeat(y[lo], interior)
+        oz = z[points] - np.repeat(z[lo], interior)
+        cx, cy, cz = (np.repeat(c, interior) for c in (cx, cy, cz))
+        dist = (oy * cz - oz * cy) ** 2
+        dist += (oz * cx - ox * cz) ** 2
+        dist += (ox * cy - oy * cx) ** 2
+        chord = np.repeat(length, interior)
+        dist = np.divide(dist, chord, out=ox * ox + oy * oy + oz * oz, where=chord > 0)
+        farthest = np.maximum.reduceat(dist, starts)
+        # First point of every section at its maximal distance
+        at_max = np.where(dist == farthest[section], points, n)
+        split = np.minimum.reduceat(at_max, starts)
+        deviates = farthest > tolerance**2
+        if max_length is not None:
+            too_long = ~deviates & (length > max_length**2)
+            split[too_long] = (lo[too_long] + hi[too_long]) // 2
+            deviates |= too_long
+        split = split[deviates]
+        mask[split] = True
+        lo = np.concatenate((lo[deviates], split))
+        hi = np.concatenate((split, hi[deviates]))
+    return mask
+
+
+def simplify(
+    track,
+    method="rdp",
+    tolerance=SIMPLIFY_TOLERANCE,
+    stride=5,
+    holes=(),
+    keep_extensions=True,
+    max_length=None,
+):
+    """
+    Simplified copy of a track (see above), keeping the anchors of the given hole
+    indices. Returns the track and the indices of the kept points.
+    """
+    if method not in SIMPLIFY_METHODS:
+        raise ValueError(
+            f"Unknown simplification {method!r}, use one of {SIMPLIFY_METHODS}."
+        )
+    keep = anchors(track, holes, keep_extensions)
+    if method == "rdp":
+        mask = rdp_mask(track, tolerance, keep, max_length)
+    else:
+        mask = stride_mask(track, stride, keep)
+    indices = np.flatnonzero(mask)
+    return track.select(indices), indices
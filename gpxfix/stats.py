@@ -0,0 +1,207 @@
+"""
+Activity statistics of a gpxfix.track.Track, computed on the whole columns at once:
+
+    distance            length of all segments (holes included, as straight lines;
+                        the gaps between segments are not counted)
+    moving_*            the steps faster than moving_speed (pauses excluded)
+    elevation_*         gain/loss of the elevation, ignoring ups and downs smaller
+                        than the hysteresis (GPS elevation noise)
+    speed_percentiles   of the moving speed, weighted by time
+    heart_rate          mean, max and the moving time in every zone, from the hr
+                        elements of the extensions (Garmin TrackPointExtension)
+
+Steps are the pairs of consecutive points of a segment. Distances are in m, times in
+s and speeds in m/s.
+"""
+
+import numpy as np
+
+from gpxfix.constants import (
+    ELEVATION_HYSTERESIS,
+    HR_ZONES,
+    MOVING_SPEED,
+    SPEED_PERCENTILES,
+)
+from gpxfix.geo import consecutive
+from gpxfix.profiling import stage
+from gpxfix.track import NO_TIME
+
+_DIGITS = 3
+
+
+def _clamp_scan(lo, hi, start):
+    """
+    Dead-band (play) filter: y[i] = clip(y[i - 1], lo[i], hi[i]) with y[-1] = start.
+    Clipping functions compose into clipping functions, so all prefixes are
+    composed with a parallel scan (log2(n) vectorized passes) instead of a loop.
+    """
+    lo, hi = lo.copy(), hi.copy()
+    shift = 1
+    while shift < len(lo):
+        # Compose the prefix ending at i - shift with the part (i - shift, i]
+        new_lo = np.clip(lo[:-shift], lo[shift:], hi[shift:])
+        hi[shift:] = np.clip(hi[:-shift], lo[shift:], hi[shift:])
+        lo[shift:] = new_lo
+        shift *= 2
+    return np.clip(start, lo, hi)
+
+
+def elevation_changes(ele, hysteresis=ELEVATION_HYSTERESIS):
+    """
+    Elevation gain and loss. A climb (descent) is counted from valley to peak once the
+    elevation has reversed by more than hysteresis, smaller ups and downs are ignored.
+    Missing elevations are skipped.
+    """
+    ele = np.asarray(ele, dtype=np.float64)
+    ele = ele[np.isfinite(ele)]
+    if len(ele) < 2:
+        return 0.0, 0.0
+    half = hysteresis / 2
+    # The filtered elevation follows the running max - half while climbing and the
+    # running min + half while descending, so every rise of it is a climb minus the
+    # hysteresis (minus half of it for the first one, which starts at ele[0])
+    filtered = _clamp_scan(ele - half, ele + half, ele[0])
+    steps = np.diff(np.concatenate(([ele[0]], filtered)))
+    moving = np.flatnonzero(steps)
+    if not len(moving):
+        return 0.0, 0.0
+    up = steps[moving] > 0
+    starts = np.flatnonzero(np.concatenate(([True], up[1:] != up[:-1])))
+    rises = np.add.reduceat(steps[moving], starts)
+    first = np.zeros(len(starts))
+    first[0] = half
+    extra = hysteresis - first
+    gain = float(np.sum((rises + extra)[rises > 0]))
+    loss = float(np.sum((extra - rises)[rises < 0]))
+    return gain, loss
+
+
+def heart_rates(track):
+    """
+    Heart rate of every point from the hr element (with any namespace prefix) of its
+    extensions, NaN where there is none. The extension bytes of all points are
+    searched at once.
+    """
+    extensions = track.extensions
+    hr = np.full(len(track), np.nan)
+    data = np.asarray(extensions.data, dtype=np.uint8)
+    if not len(data):
+        return hr
+    data = np.concatenate((data, np.zeros(_DIGITS + 1, dtype=np.uint8)))
+    # Opening tags "<hr>" or "<prefix:hr>" directly followed by a digit
+    tag = np.flatnonzero(
+        (data[1:-4] == ord("h")) & (data[2:-3] == ord("r")) & (data[3:-2] == ord(">"))
+    )
+    tag = tag[(data[tag] == ord("<")) | (data[tag] == ord(":"))]
+    # Up to _DIGITS digits after the tag (data[tag + 1:tag + 4] is "hr>")
+    value = np.zeros(len(tag))
+    digits = np.ones(len(tag), dtype=bool)
+    for k in range(_DIGITS):
+        digit = data[tag + 4 + k].astype(np.int64) - ord("0")
+        digits &= (digit >= 0) & (digit <= 9)
+        value = np.where(digits, value * 10 + digit, value)
+        if k == 0:
+            found = digits.copy()
+    tag, value = tag[found], value[found]
+    points = np.searchsorted(extensions.offsets, tag + 1, side="right") - 1
+    hr[points] = value
+    return hr
+
+
+def _weighted_percentiles(values, weights, percentiles):
+    order = np.argsort(values)
+    values, cumulative = values[order], np.cumsum(weights[order])
+    targets = np.asarray(percentiles, dtype=np.float64) / 100 * cumulative[-1]
+    ind = np.minimum(np.searchsorted(cumulative, targets), len(values) - 1)
+    return values[ind]
+
+
+def track_stats(
+    track,
+    moving_speed=MOVING_SPEED,
+    hysteresis=ELEVATION_HYSTERESIS,
+    hr_zones=HR_ZONES,
+    percentiles=SPEED_PERCENTILES,
+):
+    """
+    Statistics of the track, see above (a dict of plain numbers, ready for JSON).
+    hr_zones are the lower bounds (bpm) of the zones 2, 3, ..., zone 1 is everything
+    below the first bound.
+    """
+    with stage("stats"):
+        return _track_stats(track, moving_speed, hysteresis, hr_zones, percentiles)
+
+
+def _track_stats(track, moving_speed, hysteresis, hr_zones, percentiles):
+    n = len(track)
+    step = ~track.segment_starts()
+    step[:1] = False
+    dist = np.where(step, consecutive(track.lat, track.lon), 0.0)
+
+    time = track.time
+    timed = time != NO_TIME
+    dt = np.zeros(n)
+    if n > 1:
+        dt[1:] = (time[1:] - time[:-1]) / 1e6
+    valid = step & timed & np.concatenate(([False], timed[:-1])) & (dt > 0)
+    speed = np.divide(dist, dt, out=np.zeros(n), where=valid)
+    moving = valid & (speed >= moving_speed)
+    moving_time = float(dt[moving].sum())
+    moving_distance = float(dist[moving].sum())
+    elapsed = float((time[timed][-1] - time[timed][0]) / 1e6) if timed.any() else 0.0
+    gain, loss = elevation_changes(track.ele, hysteresis)
+
+    stats = {
+        "points": n,
+        "distance": float(dist.sum()),
+        "moving_distance": moving_distance,
+        "elapsed_time": elapsed,
+        "moving_time": moving_time,
+        "average_speed": moving_distance / moving_time if moving_time else None,
+        "elevation_gain": gain,
+        "elevation_loss": loss,
+        "speed_percentiles": {},
+        "heart_rate": None,
+    }
+    if moving.any():
+        values = _weighted_percentiles(speed[moving], dt[moving], percentiles)
+        stats["speed_percentiles"] = {
+            str(p): float(v) for p, v in zip(percentiles, values)
+        }
+
+    hr = heart_rates(track)
+    measured = np.isfinite(hr)
+    if measured.any():
+        # Every moving step counts for the zone of the heart rate at its start
+        starts = np.flatnonzero(moving) - 1
+        starts = starts[measured[starts]]
+        zone = np.searchsorted(np.asarray(hr_zones), hr[starts], side="right")
+        seconds = np.bincount(zone, weights=dt[starts + 1], minlength=len(hr_zones) + 1)
+        stats["heart_rate"] = {
+            "mean": float(hr[measured].mean()),
+            "max": float(hr[measured].max()),
+            "zone_bounds": [float(bound) for bound in hr_zones],
+            "zone_seconds": seconds.tolist(),
+        }
+    return stats
+
+
+def _duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def summary(stats):
+    """One line summary of track_stats, as shown by the GUI and gpxfix scan."""
+    text = (
+        f"{stats['distance'] / 1000:.2f} km, {_duration(stats['moving_time'])} moving"
+        f" ({_duration(stats['elapsed_time'])} total)"
+    )
+    if stats["average_speed"]:
+        text += f", {stats['average_speed'] * 3.6:.1f} km/h"
+    text += f", +{stats['elevation_gain']:.0f}/-{stats['elevation_loss']:.0f} m"
+    heart_rate = stats["heart_rate"]
+    if heart_rate:
+        zones = " ".join(_duration(s) for s in heart_rate["zone_seconds"])
+        text += f", HR {heart_rate['mean']:.0f}/{heart_rate['max']:.0f} (zones {zones})"
+    return text
@@ -0,0 +1,321 @@
+"""
+Columnar representation of a GPX track. Instead of one Python object per trackpoint,
+a track is a handful of contiguous NumPy arrays:
+
+    lat, lon, ele   float64 (degrees, degrees, meters; missing elevation is NaN)
+    time            int64 microseconds since the Unix epoch (UTC), NO_TIME if missing
+    offsets         int64 segment offsets, segment i spans offsets[i]:offsets[i + 1]
+    tracks          int64 track offsets into the segments, track j consists of the
+                    segments tracks[j]:tracks[j + 1]
+    extensions      raw <extensions> payloads (see gpxfix.extensions)
+
+All segments of all tracks of a GPX file share the same arrays.
+"""
+
+import datetime
+
+import numpy as np
+
+from gpxfix.extensions import Extensions, merge_namespaces, serialize
+
+# Sentinel for trackpoints without timestamp
+NO_TIME = np.iinfo(np.int64).min
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_EPOCH_NAIVE = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def to_epoch(time):
+    """Converts a datetime (naive ones are taken as UTC) to epoch microseconds."""
+    if time is None:
+        return NO_TIME
+    if time.tzinfo is None:
+        return (time - _EPOCH_NAIVE) // MICROSECOND
+    return (time - _EPOCH) // MICROSECOND
+
+
+def to_datetime(epoch):
+    """Converts epoch microseconds back to a timezone-aware (UTC) datetime."""
+    if epoch == NO_TIME:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=int(epoch))
+
+
+class Track:
+    def __init__(
+        self,
+        lat,
+        lon,
+        ele,
+        time,
+        offsets=None,
+        name="",
+        extensions=None,
+        namespaces=None,
+        tracks=None,
+        track_names=None,
+    ):
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self.ele = np.ascontiguousarray(ele, dtype=np.float64)
+        self.time = np.ascontiguousarray(time, dtype=np.int64)
+        if offsets is None:
+            offsets = [0, len(self.lat)]
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        if tracks is None:
+            tracks = [0, len(self.offsets) - 1]
+        self.tracks = np.ascontiguousarray(tracks, dtype=np.int64)
+        self.track_names = list(track_names or [""] * (len(self.tracks) - 1))
+        if name or not self.track_names:
+            self.name = name
+        if extensions is None:
+            extensions = Extensions.empty(len(self.lat))
+        self.extensions = extensions
+        # Namespace prefixes used by the extension payloads (prefix -> uri)
+        self.namespaces = dict(namespaces or {})
+
+    @property
+    def name(self):
+        """Name of the (first) track, also used for the file name of repaired tracks."""
+        return self.track_names[0] if self.track_names else ""
+
+    @name.setter
+    def name(self, name):
+        if not self.track_names:
+            # A file without tracks gets one empty track to carry the name
+            self.tracks = np.array([0, len(self.offsets) - 1], dtype=np.int64)
+            self.track_names = [""]
+        self.track_names[0] = name
+
+    @classmethod
+    def from_gpx(cls, gpx):
+        """
+        Builds the columnar arrays from a parsed gpxpy.gpx.GPX in bulk (one pass per
+        column over the points, no per-cell writes into a preallocated matrix). gpxpy
+        is optional (pip install gpxfix[gpxpy]), gpxfix itself reads with
+        gpxfix.parser.
+        """
+        points, offsets, tracks = [], [0], [0]
+        for track in gpx.tracks:
+            for segment in track.segments:
+                points.extend(segment.points)
+                offsets.append(len(points))
+            tracks.append(len(offsets) - 1)
+        n = len(points)
+        lat = np.fromiter((p.latitude for p in points), dtype=np.float64, count=n)
+        lon = np.fromiter((p.longitude for p in points), dtype=np.float64, count=n)
+        ele = np.fromiter(
+            (np.nan if p.elevation is None else p.elevation for p in points),
+            dtype=np.float64,
+            count=n,
+        )
+        time = np.fromiter((to_epoch(p.time) for p in points), dtype=np.int64, count=n)
+        name = (gpx.tracks[0].name if gpx.tracks else None) or ""
+        # gpxpy keeps the (last declared) default namespace as "defaultns", which is
+        # not a prefix. Unless it is the GPX namespace, it is given a free one.
+        namespaces = dict(gpx.nsmap)
+        default = namespaces.pop("defaultns", None)
+        if (
+            default
+            and not default.startswith("http://www.topografix.com/GPX/")
+            and default not in namespaces.values()
+        ):
+            n = len(namespaces)
+            while f"ns{n}" in namespaces:
+                n += 1
+            namespaces[f"ns{n}"] = default
+        prefixes = {uri: prefix for prefix, uri in namespaces.items()}
+        extensions = Extensions.from_payloads(
+            [serialize(p.extensions, prefixes) if p.extensions else b"" for p in points]
+        )
+        return cls(
+            lat,
+            lon,
+            ele,
+            time,
+            offsets,
+            name,
+            extensions,
+            namespaces,
+            tracks,
+            [track.name or "" for track in gpx.tracks],
+        )
+
+    def to_gpx(self):
+        """
+        Converts the track to a gpxpy.gpx.GPX (tracks and segments are preserved).
+        Needs the optional gpxpy (pip install gpxfix[gpxpy]).
+        """
+        import gpxpy.gpx
+
+        gpx = gpxpy.gpx.GPX()
+        gpx.nsmap.update(self.namespaces)
+        for first, last, name in zip(
+            self.tracks[:-1], self.tracks[1:], self.track_names
+        ):
+            gpx_track = gpxpy.gpx.GPXTrack(name=name)
+            gpx.tracks.append(gpx_track)
+            for start, stop in zip(self.offsets[first:last], self.offsets[first + 1 :]):
+                gpx_segment = gpxpy.gpx.GPXTrackSegment()
+                gpx_track.segments.append(gpx_segment)
+                for ind in range(start, stop):
+                    point = gpxpy.gpx.GPXTrackPoint(
+                        self.lat[ind],
+                        self.lon[ind],
+                        elevation=self.elevation(ind),
+                        time=self.datetime(ind),
+                    )
+                    point.extensions = self.extensions.elements(ind, self.namespaces)
+                    gpx_segment.points.append(point)
+        return gpx
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def n_segments(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_tracks(self):
+        return len(self.tracks) - 1
+
+    def select(self, indices):
+        """
+        New track consisting of the points at the given (sorted) indices or boolean
+        mask. Segment boundaries are preserved.
+        """
+        indices = np.arange(len(self))[indices]
+        return Track(
+            self.lat[indices],
+            self.lon[indices],
+            self.ele[indices],
+            self.time[indices],
+            np.searchsorted(indices, self.offsets),
+            name=self.name,
+            extensions=self.extensions.take(indices),
+            namespaces=self.namespaces,
+            tracks=self.tracks,
+            track_names=self.track_names,
+        )
+
+    @classmethod
+    def concatenate(cls, tracks, namespaces=None):
+        """
+        One track (with a single segment) of the points of all tracks, e.g. the
+        blocks for insert. The namespaces of the extension payloads are merged (see
+        merge_namespaces) into namespaces.
+        """
+        tracks = list(tracks)
+        namespaces, extensions = dict(namespaces or {}), []
+        for track in tracks:
+            namespaces, ext = merge_namespaces(
+                namespaces, track.namespaces, track.extensions
+            )
+            extensions.append(ext)
+        return cls(
+            np.concatenate([t.lat for t in tracks] or [[]]),
+            np.concatenate([t.lon for t in tracks] or [[]]),
+            np.concatenate([t.ele for t in tracks] or [[]]),
+            np.concatenate([t.time for t in tracks] or [np.zeros(0, np.int64)]),
+            extensions=Extensions.concatenate(extensions),
+            namespaces=namespaces,
+        )
+
+    def splice(self, position, inserted):
+        """
+        New track with the points of the track inserted placed before point position.
+        The untouched prefix and suffix are taken over as array slices, without any
+        per-point work. The inserted points become part of the segment of point
+        position - 1 (or of the first segment if position is 0). Extension payloads
+        of both tracks are copied verbatim.
+        """
+        return self.insert([position], inserted, [len(inserted)])
+
+    def insert(self, positions, inserted, counts):
+        """
+        Like splice, but for several insertions in one pass: the points of inserted
+        are split into blocks of counts[j] points, block j is placed before point
+        positions[j] (positions sorted ascending).
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        bounds = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        namespaces, extensions = merge_namespaces(
+            self.namespaces, inserted.namespaces, inserted.extensions
+        )
+        offsets = self.offsets.copy()
+        offsets[1:] += bounds[np.searchsorted(positions, offsets[1:], "right")]
+
+        # Slices of the original track interleaved with the inserted blocks
+        cuts = np.concatenate(([0], positions, [len(self)])).tolist()
+        bounds = bounds.tolist()
+
+        def join(old, new):
+            parts = [old[cuts[0] : cuts[1]]]
+            for j in range(len(positions)):
+                parts += [
+                    new[bounds[j] : bounds[j + 1]],
+                    old[cuts[j + 1] : cuts[j + 2]],
+                ]
+            return parts
+
+        return Track(
+            np.concatenate(join(self.lat, inserted.lat)),
+            np.concatenate(join(self.lon, inserted.lon)),
+            np.concatenate(join(self.ele, inserted.ele)),
+            np.concatenate(join(self.time, inserted.time)),
+            offsets,
+            name=self.name,
+            extensions=Extensions.concatenate(join(self.extensions, extensions)),
+            namespaces=namespaces,
+            tracks=self.tracks,
+            track_names=self.track_names,
+        )
+
+    def segment_starts(self):
+        """Boolean mask that is True for the first point of every segment."""
+        starts = np.zeros(len(self), dtype=bool)
+        starts[self.offsets[:-1][self.offsets[:-1] < len(self)]] = True
+        return starts
+
+    def time_diff(self, start=0, stop=None, across_segments=False):
+        """
+        Time difference (in seconds) of every point to its predecessor. It is 0 for the
+        first point of every segment (of every track if across_segments) and NaN if one
+        of the timestamps is missing. With start/stop, only the points start:stop are
+        considered (the first one gets 0).
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        time = self.time[start:stop]
+        diff = np.zeros(len(time), dtype=np.float64)
+        if len(time) > 1:
+            diff[1:] = (time[1:] - time[:-1]) / 1e6
+            missing = time == NO_TIME
+            diff[1:][missing[1:] | missing[:-1]] = np.nan
+        starts = (
+            self.offsets[self.tracks[:-1]] if across_segments else self.offsets[:-1]
+        )
+        diff[starts[(starts >= start) & (starts < stop)] - start] = 0
+        return diff
+
+    def datetime(self, ind):
+        return to_datetime(self.time[ind])
+
+    def elevation(self, ind):
+        """Elevation of point ind as float (None if missing)."""
+        return None if np.isnan(self.ele[ind]) else float(self.ele[ind])
+
+    def bounds(self, start=0, stop=None):
+        """Min/max of latitude, longitude and elevation (of the points start:stop)."""
+        lat, lon = self.lat[start:stop], self.lon[start:stop]
+        ele = self.ele[start:stop]
+        has_ele = np.isfinite(ele).any()
+        return {
+            "minLat": lat.min(),
+            "maxLat": lat.max(),
+            "minLong": lon.min(),
+            "maxLong": lon.max(),
+            "minEl": np.nanmin(ele) if has_ele else np.nan,
+            "maxEl": np.nanmax(ele) if has_ele else np.nan,
+        }
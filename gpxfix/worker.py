@@ -0,0 +1,136 @@
+"""
+Background execution of long operations (parsing, analysis, repair, writing) for the
+GUI. A Worker runs its jobs one after another in a single thread; the thread owning
+the GUI collects the finished jobs with poll(), e.g. from a Tk after() loop, and
+runs their callbacks itself, so no GUI code is ever called from the worker.
+
+The engine functions report progress through a callback (see read_gpx and
+write_gpx). Job.progress is such a callback: it records the fraction for the GUI
+and raises Cancelled once the job was cancelled, which aborts the operation at the
+next progress report (files being written are left untouched).
+"""
+
+import queue
+import threading
+
+from gpxfix.profiling import thread_profile
+
+
+class Cancelled(Exception):
+    """Raised inside a job that was cancelled."""
+
+
+class Job:
+    """
+    A function run by the Worker. on_done is called with the result and on_error
+    with the exception (not for Cancelled), both by poll() in the GUI thread.
+    """
+
+    def __init__(self, description, function, on_done=None, on_error=None):
+        self.description = description
+        self.function = function
+        self.on_done = on_done
+        self.on_error = on_error
+        # Fraction done as last reported by the function (None if unknown)
+        self.fraction = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def progress(self, fraction=None):
+        """Progress callback for the engine functions, see above."""
+        if self._cancel.is_set():
+            raise Cancelled(self.description)
+        self.fraction = fraction
+
+
+class Worker:
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.finished = queue.Queue()
+        self.current = None
+        self._pending = 0
+        self._thread = None
+
+    @property
+    def busy(self):
+        """Whether a job is running or waiting."""
+        return self._pending > 0
+
+    def submit(self, description, function, on_done=None, on_error=None):
+        """
+        Queues function(job) and returns the Job. The function gets its job, so it
+        can pass job.progress on to the engine.
+        """
+        job = Job(description, function, on_done, on_error)
+        self._pending += 1
+        self.jobs.put(job)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return job
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            self.current = job
+            try:
+                if job.cancelled:
+                    raise Cancelled(job.description)
+                # cProfile of the GUI thread does not see this thread
+                with thread_profile():
+                    result = ("done", job.function(job))
+            except Cancelled as error:
+                result = ("cancelled", error)
+            except Exception as error:
+                result = ("error", error)
+            self.current = None
+            self.finished.put((job,) + result)
+
+    def cancel(self):
+        """Cancels the running and all waiting jobs."""
+        current = self.current
+        if current is not None:
+            current.cancel()
+        for job in list(self.jobs.queue):
+            job.cancel()
+
+    def poll(self):
+        """
+        Runs the callbacks of all finished jobs (in the calling thread). Returns the
+        list of (job, status, result or exception) with status "done", "error" or
+        "cancelled". Callbacks never raise out of poll(): if on_done raises, the
+        exception goes to on_error, and exceptions nobody handled are returned with
+        status "failed" (so the caller can show them and keep polling).
+        """
+        finished = []
+        while True:
+            try:
+                job, status, value = self.finished.get_nowait()
+            except queue.Empty:
+                return finished
+            self._pending -= 1
+            try:
+                if status == "done" and job.on_done is not None:
+                    job.on_done(value)
+                elif status == "error" and job.on_error is not None:
+                    job.on_error(value)
+            except Exception as error:
+                status, value = self._callback_failed(job, status, error)
+            finished.append((job, status, value))
+
+    @staticmethod
+    def _callback_failed(job, status, error):
+        # on_done raised: the error is reported like an error of the job itself
+        if status == "done" and job.on_error is not None:
+            try:
+                job.on_error(error)
+                return "error", error
+            except Exception as handler_error:
+                error = handler_error
+        return "failed", error
@@ -0,0 +1,170 @@
+"""
+Streaming GPX writer, the counterpart of gpxfix.parser. The trackpoints are formatted
+column by column straight from the arrays of a gpxfix.track.Track and written in
+chunks, so no gpxpy DOM and no string of the whole document is ever built.
+
+Values are formatted like gpxpy does (shortest float representation, ISO timestamps
+with "Z" and microseconds only if present), extension payloads are written verbatim.
+The output only depends on the track, so identical tracks give identical files.
+"""
+
+import functools
+import os
+import stat
+import tempfile
+
+import numpy as np
+
+from gpxfix.extensions import escape, quoteattr
+from gpxfix.parser import CHUNK_SIZE
+from gpxfix.profiling import count, stage
+from gpxfix.track import NO_TIME
+
+GPX_NAMESPACE = "http://www.topografix.com/GPX/1/1"
+XSI_NAMESPACE = "http://www.w3.org/2001/XMLSchema-instance"
+SCHEMA_LOCATION = f"{GPX_NAMESPACE} http://www.topografix.com/GPX/1/1/gpx.xsd"
+CREATOR = "gpxfix"
+
+
+def format_floats(values):
+    """
+    Shortest decimal representation of every value (like str(float)), without the
+    scientific notation that GPX 1.1 does not allow.
+    """
+    strings = np.asarray(values, dtype=np.float64).astype(str)
+    scientific = np.flatnonzero(np.char.find(strings, "e") >= 0)
+    for ind in scientific:
+        strings[ind] = format(values[ind], ".10f").rstrip("0").rstrip(".")
+    return strings.tolist()
+
+
+def format_times(epochs):
+    """
+    ISO 8601 timestamps (UTC, "Z") of epoch microseconds. Fractions are only written
+    for timestamps with microseconds, missing timestamps give None.
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    strings = np.datetime_as_string(epochs.astype("datetime64[us]"), unit="us")
+    whole = epochs % 1_000_000 == 0
+    # "YYYY-MM-DDTHH:MM:SS" without ".ffffff" for whole seconds
+    strings = np.where(whole, strings.astype("U19"), strings)
+    strings = np.char.add(strings, "Z").tolist()
+    for ind in np.flatnonzero(epochs == NO_TIME):
+        strings[ind] = None
+    return strings
+
+
+def _header(track):
+    namespaces = [("xmlns", GPX_NAMESPACE)]
+    namespaces += [
+        (f"xmlns:{prefix}", uri)
+        for prefix, uri in sorted(track.namespaces.items())
+        if prefix != "xsi"
+    ]
+    namespaces += [("xmlns:xsi", XSI_NAMESPACE)]
+    attrs = "".join(f" {name}={quoteattr(uri)}" for name, uri in namespaces)
+    header = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<gpx{attrs} xsi:schemaLocation="{SCHEMA_LOCATION}" version="1.1"'
+        f' creator="{CREATOR}">\n'
+    )
+    return header.encode("utf-8")
+
+
+def _points(track, start, stop):
+    # One chunk of trackpoints. Payloads are decoded as latin-1 (one character per
+    # byte), so they are written back byte by byte.
+    lat = format_floats(track.lat[start:stop])
+    lon = format_floats(track.lon[start:stop])
+    ele = [
+        f"        <ele>{value}</ele>\n"
+        for value in format_floats(np.nan_to_num(track.ele[start:stop]))
+    ]
+    for ind in np.flatnonzero(np.isnan(track.ele[start:stop])):
+        ele[ind] = ""
+    time = [
+        f"        <time>{value}</time>\n" if value else ""
+        for value in format_times(track.time[start:stop])
+    ]
+    extensions = track.extensions.slice(start, stop)
+    ext = [""] * (stop - start)
+    if len(extensions.data):
+        data = extensions.data.tobytes().decode("latin-1")
+        offsets = extensions.offsets.tolist()
+        for ind in np.flatnonzero(extensions.lengths()).tolist():
+            payload = data[offsets[ind] : offsets[ind + 1]]
+            ext[ind] = f"        <extensions>{payload}</extensions>\n"
+    return "".join(
+        [
+            f'      <trkpt lat="{la}" lon="{lo}">\n{e}{t}{x}      </trkpt>\n'
+            for la, lo, e, t, x in zip(lat, lon, ele, time, ext)
+        ]
+    ).encode("latin-1")
+
+
+def _write(track, f, chunk_size, progress):
+    f.write(_header(track))
+    offsets = track.offsets.tolist()
+    for first, last, name in zip(
+        track.tracks[:-1].tolist(), track.tracks[1:].tolist(), track.track_names
+    ):
+        f.write(b"  <trk>\n")
+        if name:
+            f.write(f"    <name>{escape(name)}</name>\n".encode("utf-8"))
+        for start, stop in zip(offsets[first:last], offsets[first + 1 : last + 1]):
+            f.write(b"    <trkseg>\n")
+            for chunk in range(start, stop, chunk_size):
+                end = min(chunk + chunk_size, stop)
+                with stage("serialize"):
+                    data = _points(track, chunk, end)
+                with stage("write"):
+                    f.write(data)
+                if progress is not None:
+                    progress(end / len(track))
+            f.write(b"    </trkseg>\n")
+        f.write(b"  </trk>\n")
+    f.write(b"</gpx>\n")
+
+
+@functools.lru_cache(maxsize=None)
+def file_mode(directory):
+    """
+    Permissions of a regular new file in directory (0o666 without the umask). The
+    umask cannot be read without changing it for all threads, so a probe file is
+    created with the default mode instead, once per directory.
+    """
+    while True:
+        probe = os.path.join(directory, f".gpxfix-{os.urandom(6).hex()}.mode")
+        try:
+            fd = os.open(probe, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        os.close(fd)
+        return stat.S_IMODE(os.stat(probe).st_mode)
+    finally:
+        os.unlink(probe)
+
+
+def write_gpx(track, path, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Writes a gpxfix.track.Track as GPX file. The file is written to a temporary file
+    next to path first and renamed afterwards, so path never contains a partial file.
+    progress is called after every chunk with the fraction of the points written, if
+    it raises, path is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            _write(track, f, chunk_size, progress)
+        # mkstemp creates private files, use the permissions of a regular new file
+        os.chmod(tmp_path, file_mode(directory))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    count("points written", len(track))